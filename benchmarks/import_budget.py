@@ -0,0 +1,54 @@
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that must stay out of the main window's import; each is loaded by the window that needs it
+deferred_modules = ['matplotlib', 'seaborn', 'pandas', 'numpy', 'scipy', 'sklearn', 'pyarrow']
+
+probe = """import sys, time
+start = time.perf_counter()
+import user_interfaces.main_window
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(','.join(sorted({name.split('.')[0] for name in sys.modules})))
+"""
+
+
+def measure():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], cwd=PROJECT_PATH, capture_output=True,
+                            text=True, check=True)
+    elapsed, modules = result.stdout.strip().splitlines()[-2:]
+    timings = list()
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+            _, cumulative, name = [field.strip() for field in line[len('import time:'):].split('|')]
+            timings.append((int(cumulative), name))
+    return float(elapsed), set(modules.split(',')), sorted(timings, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that the main window imports within its startup budget.')
+    parser.add_argument('-b', '--budget', type=float, default=1.0, help='allowed import time in seconds')
+    parser.add_argument('-n', '--top', type=int, default=10, help='number of slowest imports to list')
+    args = parser.parse_args()
+
+    elapsed, modules, timings = measure()
+    print(f"Main window import: {elapsed:.3f} s (budget {args.budget:.3f} s)")
+    for cumulative, name in timings[:args.top]:
+        print(f"  {cumulative / 1e6:8.3f} s  {name}")
+    failures = list()
+    if elapsed > args.budget:
+        failures.append(f"import took {elapsed:.3f} s, over the {args.budget:.3f} s budget")
+    eager = sorted(set(deferred_modules) & modules)
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':  # runs only if file is executed, not when it's imported
+    sys.exit(main())
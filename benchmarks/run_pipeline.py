@@ -0,0 +1,111 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import baseline_name, make_experiment_tree
+from utility.config import PROJECT_PATH, defaults
+from utility.corrections import iv_temperature_correction, iv_irradiance_fit, iv_irradiance_correction
+from utility.dataframe_edit import merge_film_db
+from utility.dataframe_info import pv_explore_groups
+from utility.load import load_experiments
+from utility.process import average_by_experiment, average_by, calc_efficiency
+from utility.session import Session
+from utility.trace_processing import fit_experiments
+
+# Run from the project folder as 'python -m benchmarks.run_pipeline'. Peak memory is what tracemalloc sees in this
+# process (Python objects and NumPy buffers); work done in process pool workers only shows up in the wall time.
+
+scales = {'small': 10, 'medium': 1000, 'large': 100000}
+
+
+def pipeline_stages(session, paths, workers):
+    return [('load_experiments', lambda: load_experiments(session, paths['data'], True, workers)),
+            ('iv_temperature_correction', lambda: iv_temperature_correction(session, True)),
+            ('iv_irradiance_fit', lambda: iv_irradiance_fit(session, baseline_name, '2')),
+            ('iv_irradiance_correction', lambda: iv_irradiance_correction(session, '2', 515., True)),
+            ('average_by_experiment', lambda: average_by_experiment(session, True)),
+            ('average_by', lambda: average_by(session, 'name', True)),
+            ('calc_efficiency', lambda: calc_efficiency(session, baseline_name, True)),
+            ('merge_film_db', lambda: merge_film_db(session, True)),
+            ('pv_explore_groups', lambda: pv_explore_groups(session.df)),
+            ('fit_experiments', lambda: fit_experiments(paths['sweeps'], workers))]
+
+
+def measure(stages, session):
+    results = list()
+    for name, run in stages:
+        rows_in = len(session.df.index)
+        tracemalloc.start()
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results.append({'stage': name, 'seconds': seconds, 'peak_bytes': peak, 'rows_in': rows_in,
+                        'rows_out': len(session.df.index)})
+        print(f"{name:28s} {seconds:9.3f} s {peak / 2 ** 20:9.1f} MiB {rows_in:9d} -> {len(session.df.index)} rows")
+    return results
+
+
+def regressions(results, baseline_path, tolerance):
+    with open(baseline_path) as f:
+        baseline = {entry['stage']: entry for entry in json.load(f)['stages']}
+    found = list()
+    for entry in results:
+        reference = baseline.get(entry['stage'])
+        if reference is None:
+            continue
+        for key in ['seconds', 'peak_bytes']:
+            if reference[key] > 0 and entry[key] > reference[key] * (1 + tolerance):
+                found.append(f"{entry['stage']}: {key} {entry[key]:.4g} vs {reference[key]:.4g}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the PV processing chain on synthetic data.')
+    parser.add_argument('-s', '--scale', default='small', help=f"one of {', '.join(scales)} or a number of "
+                                                                 f"experiments")
+    parser.add_argument('-t', '--traces', type=int, default=5, help='traces per experiment')
+    parser.add_argument('--sweeps', type=int, default=10, help='experiments with raw sweeps for the trace fitters')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='worker processes for parsing and fitting')
+    parser.add_argument('-d', '--data-dir', default=None, help='where to generate (and reuse) the synthetic tree')
+    parser.add_argument('-o', '--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--compare', default=None, help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown or memory growth')
+    args = parser.parse_args()
+
+    n_experiments = scales[args.scale] if args.scale in scales else int(args.scale)
+    root = args.data_dir or os.path.join(PROJECT_PATH, 'benchmarks', 'data', f'{n_experiments}_{args.traces}')
+    print(f"Generating {n_experiments} experiments in {root}")
+    start = time.perf_counter()
+    paths = make_experiment_tree(root, n_experiments, args.traces, n_sweep_experiments=args.sweeps)
+    print(f"Data ready after {time.perf_counter() - start:.1f} s")
+
+    export_path = os.path.join(root, 'processed')
+    shutil.rmtree(export_path, ignore_errors=True)
+    os.makedirs(export_path)
+    session = Session(export_path=export_path, film_db=paths['film_db'])
+    results = measure(pipeline_stages(session, paths, args.workers), session)
+
+    report = {'n_experiments': n_experiments, 'n_traces': args.traces, 'n_sweep_experiments': args.sweeps,
+              'workers': args.workers, 'checkpoint': defaults['checkpoint'], 'python': platform.python_version(),
+              'machine': platform.machine(), 'cpu_count': os.cpu_count(), 'created': time.time(),
+              'stages': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        found = regressions(results, args.compare, args.tolerance)
+        for line in found:
+            print(f"REGRESSION: {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == '__main__':  # runs only if file is executed, not when it's imported
+    sys.exit(main())
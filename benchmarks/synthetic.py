@@ -0,0 +1,113 @@
+import json
+import numpy as np
+import os
+import pandas as pd
+
+from utility.load import drop_columns
+
+# Synthetic solar simulator data in the layout the pipeline reads: one folder per experiment holding an
+# IV_Summary.xlsx with one row per trace, a film database, and optionally raw sweep files for the trace fitters.
+
+film_columns = ['Film ID', 'Matrix', 'Solvent', 'QD Type', 'QD Batch', 'QD Manufacturer', 'QD Concentration (mg/g)',
+                'Nominal Emission (nm)', 'Manufactured', 'Thickness (mm)', 'Tape Layers', 'Additives',
+                'Additive concentration (%)', 'Film Length (mm)', 'Film width (mm)', 'Comment']
+baseline_name = 'PV masked'
+
+
+def film_ids(n_films):
+    return [f'F{i:05d}' for i in range(n_films)]
+
+
+def make_film_database(path, n_films, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({'Film ID': film_ids(n_films),
+                       'Matrix': rng.choice(['PMMA', 'PVB', 'EVA'], n_films),
+                       'Solvent': rng.choice(['Toluene', 'Chloroform'], n_films),
+                       'QD Type': rng.choice(['None', 'CdSe', 'CuInS'], n_films),
+                       'QD Batch': rng.choice(['B1', 'B2', 'B3', 'B4'], n_films),
+                       'QD Manufacturer': rng.choice(['Lambda', 'External'], n_films),
+                       'QD Concentration (mg/g)': rng.choice([0.1, 0.5, 1., 2.], n_films),
+                       'Nominal Emission (nm)': rng.choice([620, 650, 680], n_films),
+                       'Manufactured': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 365, n_films), 'D'),
+                       'Thickness (mm)': rng.choice([0.1, 0.2, 0.5], n_films),
+                       'Tape Layers': rng.integers(1, 4, n_films),
+                       'Additives': rng.choice(['None', 'TOPO'], n_films),
+                       'Additive concentration (%)': rng.choice([0., 0.5], n_films),
+                       'Film Length (mm)': 50, 'Film width (mm)': 50, 'Comment': ''}, columns=film_columns)
+    df.to_excel(path, index=False)
+    return path
+
+
+def summary_frame(rng, experiment, n_traces, name, film_id, start):
+    df = pd.DataFrame({'timestamp': start + np.arange(n_traces) * 10.,
+                       'isc_fit': rng.normal(20, .5, n_traces), 'voc_fit': rng.normal(500, 5, n_traces),
+                       'pmax_fit': rng.normal(7, .2, n_traces), 't_sample': rng.normal(27, 1, n_traces),
+                       'irrad1': rng.normal(500, 5, n_traces), 'irrad2': rng.normal(515, 5, n_traces),
+                       'irrad3': rng.normal(500, 5, n_traces), 'irrad4': rng.normal(500, 5, n_traces),
+                       'name': name, 'film_id': film_id, 't_room': 22., 'rh_room': 40.})
+    for col in drop_columns[1:]:
+        df[col] = experiment
+    return df
+
+
+def write_sweep(path, rng, start, n_points):
+    voltage = np.linspace(0, 0.65, n_points)
+    current = 0.02 - 4e-9 * np.exp(voltage / 0.035) + rng.normal(0, 1e-6, n_points)
+    power = voltage * current
+    columns = np.column_stack([voltage, current, power, rng.normal(27, .1, n_points)] +
+                              [rng.normal(500, 2, n_points) for _ in range(4)])
+    voc_idx, pmax_idx = int(np.argmin(np.abs(current))), int(np.argmax(power))
+    with open(path, 'w') as f:
+        f.write(f'Time (s),{start}\n')
+        f.write(f'Short Circuit Current I_sc (A),{current[0]},1e-6\n')
+        f.write(f'Open Circuit Voltage V_oc (V),{voltage[voc_idx]},1e-4\n')
+        f.write(f'Maximum Power P_max (W),{power[pmax_idx]},1e-6\n')
+        f.write(f'Fill Factor,{power[pmax_idx] / (current[0] * voltage[voc_idx])},0.01\n')
+        f.write('Average Temperature T_avg (C),27,0.1\n')
+        for k in range(1, 5):
+            f.write(f'Average Irradiance I_{k}_avg (W/m2),500,2\n')
+        f.write('Voltage (V),Current (A),Power (W),Temperature (C),Irradiance 1 (W/m2),Irradiance 2 (W/m2),'
+                'Irradiance 3 (W/m2),Irradiance 4 (W/m2)\n')
+        np.savetxt(f, columns, delimiter=',', fmt='%.10g')
+
+
+def make_experiment_tree(root, n_experiments, n_traces=5, n_films=None, n_sweep_experiments=0, n_points=400,
+                         experiments_per_day=50, seed=0):
+    # reuses an existing tree generated with the same parameters, since writing many Excel files is slow
+    params = {'n_experiments': n_experiments, 'n_traces': n_traces, 'n_films': n_films,
+              'n_sweep_experiments': n_sweep_experiments, 'n_points': n_points,
+              'experiments_per_day': experiments_per_day, 'seed': seed}
+    meta_path = os.path.join(root, 'synthetic.json')
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == params:
+                return tree_paths(root)
+    rng = np.random.default_rng(seed)
+    n_films = n_films or max(2, n_experiments // 5)
+    ids = film_ids(n_films)
+    os.makedirs(os.path.join(root, 'data'), exist_ok=True)
+    make_film_database(os.path.join(root, 'film_database.xlsx'), n_films, seed)
+    start = 1.6e9
+    for i in range(1, n_experiments + 1):
+        day = os.path.join(root, 'data', f'day{(i - 1) // experiments_per_day:05d}')
+        folder = os.path.join(day, f'{i:06d} experiment')
+        os.makedirs(folder, exist_ok=True)
+        name = baseline_name if i % 4 == 1 else f'film{i % n_films}'
+        summary_frame(rng, i, n_traces, name, ids[i % n_films], start).to_excel(
+            os.path.join(folder, 'IV_Summary.xlsx'))
+        start += 600.
+    for i in range(1, n_sweep_experiments + 1):
+        folder = os.path.join(root, 'sweeps', f'{i:06d} experiment')
+        os.makedirs(folder, exist_ok=True)
+        for j in range(n_traces):
+            write_sweep(os.path.join(folder, f'trace_{j:02d}.csv'), rng, 1.6e9 + i * 600 + j * 10, n_points)
+    with open(meta_path, 'w') as f:
+        json.dump(params, f)
+    return tree_paths(root)
+
+
+def tree_paths(root):
+    sweeps = os.path.join(root, 'sweeps')
+    return {'data': os.path.join(root, 'data'), 'film_db': os.path.join(root, 'film_database.xlsx'),
+            'sweeps': sorted(os.path.join(sweeps, folder) for folder in os.listdir(sweeps))
+            if os.path.isdir(sweeps) else []}
@@ -0,0 +1,29 @@
+import argparse
+import sys
+
+from utility.pipeline import example_job, run_jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process PV measurement days without the GUI.')
+    parser.add_argument('jobs', nargs='*', help='job files describing the processing chain')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='number of jobs to run in parallel')
+    parser.add_argument('--profile', action='store_true', help='run every stage under cProfile, stats are saved in '
+                                                               'the export folder next to run_report.json')
+    parser.add_argument('--append', action='store_true', help='process only experiment folders added since the '
+                                                              'last run, with the parameters that run recorded')
+    parser.add_argument('--example', action='store_true', help='print an example job file and exit')
+    args = parser.parse_args()
+
+    if args.example:
+        print(example_job)
+        return 0
+    if not args.jobs:
+        parser.error('no job files given')
+    for job_path, n_rows in run_jobs(args.jobs, args.workers, args.profile, args.append):
+        print(f"{job_path}: {n_rows} rows processed")
+    return 0
+
+
+if __name__ == '__main__':  # runs only if file is executed, not when it's imported
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import os
+import pytest
+import shutil
+
+from benchmarks.synthetic import baseline_name, make_experiment_tree
+from utility import append
+from utility.checkpoint import load_stage
+from utility.load import manifest_name, read_manifest
+from utility.pipeline import append_job, run_job
+
+
+def job_tree(tmp_path):
+    paths = make_experiment_tree(str(tmp_path / 'tree'), 8, n_traces=3)
+    day = os.path.join(paths['data'], sorted(os.listdir(paths['data']))[0])
+    held_back = os.path.join(str(tmp_path), sorted(os.listdir(day))[-1])
+    shutil.move(os.path.join(day, os.path.basename(held_back)), held_back)
+    job_path = str(tmp_path / 'job.ini')
+    with open(job_path, 'w') as f:
+        f.write(f"[paths]\nimport = {paths['data']}\nexport = {tmp_path / 'out'}\nfilm_db = {paths['film_db']}\n\n"
+                f"[temperature]\n\n[average]\nby = name\n\n[efficiency]\nreference = {baseline_name}\n")
+    return job_path, held_back, day
+
+
+def test_failed_append_is_retried(tmp_path, monkeypatch):
+    job_path, held_back, day = job_tree(tmp_path)
+    run_job(job_path)
+    out = str(tmp_path / 'out')
+    shutil.move(held_back, os.path.join(day, os.path.basename(held_back)))
+
+    def failing(df):
+        raise RuntimeError('averaging failed')
+
+    monkeypatch.setattr(append, 'experiment_averages', failing)
+    with pytest.raises(RuntimeError):
+        append_job(job_path)
+    assert len(read_manifest(os.path.join(out, manifest_name))['files']) == 7
+    monkeypatch.undo()
+
+    append_job(job_path)
+    assert len(read_manifest(os.path.join(out, manifest_name))['files']) == 8
+    assert len(load_stage('IV_Summary_Average', out).index) == 8
+    # nothing new: the stored final stage is reported
+    assert append_job(job_path)[1] == len(load_stage('IV_Summary_Efficiency', out).index)
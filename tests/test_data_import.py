@@ -0,0 +1,15 @@
+import numpy as np
+import os
+
+from benchmarks.synthetic import write_sweep
+from utility.data_import import Trace
+
+
+def test_trace_without_sidecar_loads(tmp_path):
+    path = os.path.join(str(tmp_path), 'trace_00.csv')
+    write_sweep(path, np.random.default_rng(0), 1.6e9, 50)
+    trace = Trace(path)
+    assert trace.columns.shape == (len(trace.column_names), 50)
+    assert os.path.exists(trace.sidecar_path)
+    # a second trace object reads the sidecar
+    assert np.array_equal(Trace(path).columns, trace.columns)
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from utility.dataframe_info import grouped_mode
+
+
+def test_grouped_mode_ignores_rows_without_group_key():
+    # rows without a group key count for no group
+    keys = pd.Series(['a', 'a', 'b', np.nan, np.nan, np.nan])
+    values = pd.Series(['x', 'x', 'y', 'z', 'z', 'z'])
+    group_codes, groups = pd.factorize(keys, sort=True)
+    modes = grouped_mode(group_codes, len(groups), values)
+    assert list(modes) == ['x', 'y']
+
+
+def test_grouped_mode_matches_series_mode():
+    rng = np.random.default_rng(0)
+    keys = pd.Series(rng.integers(0, 5, 200))
+    values = pd.Series(rng.choice(['p', 'q', 'r', None], 200))
+    group_codes, groups = pd.factorize(keys, sort=True)
+    modes = grouped_mode(group_codes, len(groups), values)
+    expected = [values[keys == group].mode()[0] for group in groups]
+    assert list(modes) == expected
@@ -0,0 +1,33 @@
+import numpy as np
+import os
+from scipy import optimize
+
+from benchmarks.synthetic import write_sweep
+from utility.data_import import Trace
+from utility.fitting import fit_shockley, fit_traces, shockley
+
+
+def test_pmax_fit_matches_curve_fit(tmp_path):
+    rng = np.random.default_rng(1)
+    traces = list()
+    for j in range(5):
+        path = os.path.join(str(tmp_path), f'trace_{j:02d}.csv')
+        write_sweep(path, rng, 1.6e9 + j * 10, 400)
+        traces.append(Trace(path))
+    results = fit_traces(traces)
+    for trace, pmax in zip(traces, results['Pmax_fit']):
+        idx = trace.anchors['pmax']
+        v, i = trace.column('Voltage (V)')[idx - 10:idx + 10], trace.column('Current (A)')[idx - 10:idx + 10]
+        popt, _ = optimize.curve_fit(shockley, v, i, p0=[trace.values['Short Circuit Current I_sc (A)'][0], 4e-5,
+                                                         7.5e-2], maxfev=100000)
+        v_mp = optimize.minimize_scalar(lambda x: -x * shockley(x, *popt)).x
+        assert abs(pmax / (v_mp * shockley(v_mp, *popt)) - 1) < 1e-7
+
+
+def test_unconverged_shockley_rows_are_nan():
+    v = np.linspace(0.4, 0.5, 20)[None, :]
+    i = 0.02 - 4e-9 * np.exp(v / 0.035)
+    pars = fit_shockley(np.vstack([v, v]), np.vstack([i, i]), [[0.02, 4e-5, 7.5e-2], [0.02, 4e-5, 7.5e-2]], n_iter=5)
+    assert np.isnan(pars).all()
+    pars = fit_shockley(v, i, [[0.02, 4e-5, 7.5e-2]])
+    assert np.allclose(pars[0], [0.02, 4e-9, 0.035], rtol=1e-6)
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from utility.checkpoint import load_stage, save_stage
+from utility.load import experiment_numbers, with_experiment_numbers
+
+
+def test_experiment_numbers_keep_last_three_digits():
+    keys = ['Exp001', 'Exp012', 'Run1234', 'blank']
+    assert list(experiment_numbers(keys)) == [1, 12, 234, -1]
+
+
+def test_two_level_excel_stage_reads_back(tmp_path):
+    # sheets saved before the exp_no level existed
+    index = pd.MultiIndex.from_tuples([('Exp001', 0), ('Exp001', 1), ('Exp002', 0)], names=['key', 'row'])
+    df = pd.DataFrame({'isc': [1.0, 2.0, 3.0]}, index=index)
+    save_stage(df, 'IV_Summary', str(tmp_path), backend='excel')
+    loaded = load_stage('IV_Summary', str(tmp_path))
+    assert list(loaded.index.names) == ['key', 'row']
+    assert np.allclose(loaded['isc'].values, df['isc'].values)
+    assert list(with_experiment_numbers(loaded.index).get_level_values('exp_no')) == [1, 1, 2]
+
+
+def test_three_level_excel_stage_reads_back(tmp_path):
+    index = with_experiment_numbers(pd.MultiIndex.from_tuples([('Exp001', 0), ('Exp002', 0)], names=['key', 'row']))
+    df = pd.DataFrame({'isc': [1.0, 3.0]}, index=index)
+    save_stage(df, 'IV_Summary', str(tmp_path), backend='excel')
+    loaded = load_stage('IV_Summary', str(tmp_path))
+    assert list(loaded.index.names) == ['key', 'exp_no', 'row']
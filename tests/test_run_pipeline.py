@@ -0,0 +1,15 @@
+import os
+
+from benchmarks.run_pipeline import measure, pipeline_stages
+from benchmarks.synthetic import make_experiment_tree
+from utility.session import Session
+
+
+def test_pipeline_stages_run_end_to_end(tmp_path):
+    paths = make_experiment_tree(str(tmp_path / 'tree'), 5, n_traces=3, n_sweep_experiments=2, n_points=100)
+    export_path = str(tmp_path / 'processed')
+    os.makedirs(export_path)
+    session = Session(export_path=export_path, film_db=paths['film_db'])
+    results = measure(pipeline_stages(session, paths, 1), session)
+    assert [entry['stage'] for entry in results][-1] == 'fit_experiments'
+    assert results[0]['rows_out'] == 15
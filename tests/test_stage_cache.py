@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+
+from utility.checkpoint import find_stage
+from utility.config import defaults
+from utility.load import with_experiment_numbers
+from utility.session import Session
+from utility.stage_cache import frame_digest, run_stage
+
+
+def summary(tmp_path):
+    index = with_experiment_numbers(pd.MultiIndex.from_tuples([('Exp001', 0), ('Exp002', 0)], names=['key', 'row']))
+    df = pd.DataFrame({'isc': [1.0, 3.0], 'datetime': pd.to_datetime([0, 600], unit='s').as_unit('s')}, index=index)
+    return Session(df, export_path=str(tmp_path))
+
+
+def test_cache_hit_reuses_the_checkpoint(tmp_path):
+    calls = list()
+
+    def compute(df):
+        calls.append(1)
+        return df.assign(isc=df['isc'] * 2)
+
+    session = summary(tmp_path)
+    df_in = session.df
+    run_stage(session, 'IV_Summary_T_corr', compute, {})
+    checkpoint = os.stat(find_stage('IV_Summary_T_corr', str(tmp_path)))
+    session.df = df_in
+    run_stage(session, 'IV_Summary_T_corr', compute, {})
+    assert len(calls) == 1
+    assert os.stat(find_stage('IV_Summary_T_corr', str(tmp_path))).st_mtime_ns == checkpoint.st_mtime_ns
+    assert list(session.df['isc']) == [2.0, 6.0]
+
+
+def test_excel_cache_hit_keeps_the_index(tmp_path, monkeypatch):
+    monkeypatch.setitem(defaults, 'checkpoint', 'excel')
+    session = summary(tmp_path)
+    df_in = session.df
+    run_stage(session, 'IV_Summary_T_corr', lambda df: df, {})
+    session.df = df_in
+    run_stage(session, 'IV_Summary_T_corr', lambda df: df, {})
+    assert list(session.df.index.names) == ['key', 'exp_no', 'row']
+
+
+def test_digest_ignores_the_datetime_unit(tmp_path):
+    df = summary(tmp_path).df
+    assert frame_digest(df) == frame_digest(df.assign(datetime=df['datetime'].dt.as_unit('ms')))
@@ -1,16 +1,18 @@
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+import numpy as np
 import os
 from PyQt5 import QtCore, QtGui, QtWidgets
 
 from user_interfaces.widgets.separator import Separator
 from utility.colors import color_wheel
 from utility.config import paths
-from utility.corrections import reference_fit
+from utility.corrections import grouped_reference_fit, reference_fit
 from utility.dataframe_info import pv_explore_groups
-import utility.globals as glob
-from utility.load import load_global_df
+from utility.load import load_session
+from utility.plot import set_style
 from utility.process import pce_vs_reference
+from utility.session import Session
 
 
 class ChangePVWindow(QtWidgets.QMdiSubWindow):
@@ -31,6 +33,8 @@ class ChangePVWidget(QtWidgets.QWidget):
     def __init__(self, parent):
         super(ChangePVWidget, self).__init__(parent)
 
+        set_style()
+        self.session = Session()
         self.init_ui()
 
     def init_ui(self):
@@ -76,9 +80,16 @@ class ChangePVWidget(QtWidgets.QWidget):
         xaxis_combobox.addItem("Thickness (mm)")
         xaxis_combobox.addItem("Tape Layers")
         hbox_fit.addWidget(xaxis_combobox)
+        hbox_fit.addWidget(QtWidgets.QLabel("Baseline per", self))
+        by_combobox = QtWidgets.QComboBox(self)
+        for item in ["all", "Matrix", "Solvent", "QD Batch"]:
+            by_combobox.addItem(item)
+        by_combobox.setToolTip('Fit one baseline to all reference groups, or a separate one per matrix, solvent or '
+                               'QD batch')
+        hbox_fit.addWidget(by_combobox)
         fit_button = QtWidgets.QPushButton("Fit reference")
-        fit_button.clicked.connect(lambda: self.fit_reference(ref_idx_edit.text(),
-                                                              xaxis_combobox.currentText()))
+        fit_button.clicked.connect(lambda: self.fit_reference(ref_idx_edit.text(), xaxis_combobox.currentText(),
+                                                              by_combobox.currentText()))
         hbox_fit.addWidget(fit_button)
         hbox_fit.addStretch(-1)
         vbox.addLayout(hbox_fit)
@@ -94,7 +105,8 @@ class ChangePVWidget(QtWidgets.QWidget):
 
         vbox.addWidget(Separator())
         vbox.addWidget(QtWidgets.QLabel("3. Specify the groups that are to be analysed against the fitted baseline. "
-                                        "Separate group indices with commas.", self))
+                                        "Separate group indices with commas.\n"
+                                        "Leave empty to analyse all groups.", self))
         hbox_corr = QtWidgets.QHBoxLayout()
         hbox_corr.addWidget(QtWidgets.QLabel("Film groups", self))
         grp_idx_edit = QtWidgets.QLineEdit('', self)
@@ -102,7 +114,8 @@ class ChangePVWidget(QtWidgets.QWidget):
         hbox_corr.addWidget(grp_idx_edit)
         calc_button = QtWidgets.QPushButton("Calculate")
         calc_button.clicked.connect(lambda: self.compare_to_reference(grp_idx_edit.text(),
-                                                                      xaxis_combobox.currentText()))
+                                                                      xaxis_combobox.currentText(),
+                                                                      by_combobox.currentText()))
         hbox_corr.addWidget(calc_button)
         hbox_corr.addStretch(-1)
         vbox.addLayout(hbox_corr)
@@ -116,27 +129,42 @@ class ChangePVWidget(QtWidgets.QWidget):
         self.file_edit.setText(paths['pv_improve_file'])
 
     def load_data(self):
-        load_global_df(paths['pv_improve_file'])
-        group_info = pv_explore_groups(glob.df)
+        self.session = load_session(paths['pv_improve_file'])
+        group_info = self.session.cached('explore_groups', pv_explore_groups)
         self.load_edit.append("\t".join(['Grp', 'Matrix', 'QD Type', 'Emis.', 'QD Conc.', 'Solvent',
                                          'Addit.', 'Addit. conc.', 'Made', 'Measured']))
         for gp in group_info:
             self.load_edit.append("\t".join(gp[1:]))
 
-    def fit_reference(self, text_string, xaxis):
-        y_pred = reference_fit(eval('[' + text_string + ']'), xaxis)
-
-        mask = glob.df['group'].isin(eval('[' + text_string + ']'))
-        df_fit = glob.df[mask].sort_values(by=xaxis)
+    def fit_reference(self, text_string, xaxis, by):
+        groups = eval('[' + text_string + ']')
+        if by == 'all':
+            y_pred = reference_fit(self.session, groups, xaxis)
+            df_fit = self.session.df[self.session.df['group'].isin(groups)].sort_values(by=xaxis)
+            lines = [(df_fit, y_pred, None)]
+        else:
+            y_pred = grouped_reference_fit(self.session, groups, xaxis, by)
+            mask = self.session.df['group'].isin(groups).values
+            order = np.argsort(self.session.df[xaxis].values, kind='stable')
+            lines = list()
+            for level in self.session.grouped_reference_fit['levels']:
+                rows = order[(mask & (self.session.df[by] == level).values)[order]]
+                if not len(rows):  # no reference groups at this level
+                    continue
+                lines.append((self.session.df.iloc[rows], [pred[rows] for pred in y_pred], str(level)))
 
         self.plot_canvas.figure.clear()
         axes = [None, None, None]
         for i, key in zip(range(2), ['isc_eff', 'pmax_eff']):
             axes[i] = self.plot_canvas.figure.add_subplot(1, 2, i+1)
-            axes[i].errorbar(df_fit[xaxis], df_fit[key], yerr=glob.df[mask][f"d{key}"],
-                             ecolor=color_wheel[0], elinewidth=1.5, capsize=3,
-                             color=color_wheel[1], lw=3, marker='s', ms=8)
-            axes[i].plot(df_fit[xaxis], y_pred[i], color=color_wheel[2])
+            for j, (df_fit, pred, label) in enumerate(lines):
+                color = color_wheel[(2 * j + 1) % len(color_wheel)]
+                axes[i].errorbar(df_fit[xaxis], df_fit[key], yerr=df_fit[f"d{key}"],
+                                 ecolor=color_wheel[0], elinewidth=1.5, capsize=3,
+                                 color=color, lw=3, marker='s', ms=8, label=label)
+                axes[i].plot(df_fit[xaxis], pred[i], color=color_wheel[(2 * j + 2) % len(color_wheel)])
+            if by != 'all':
+                axes[i].legend()
             axes[i].set_xlabel(xaxis)
             axes[i].set_ylabel(key)
         self.plot_canvas.figure.tight_layout(pad=0.3)
@@ -144,6 +172,9 @@ class ChangePVWidget(QtWidgets.QWidget):
                                                      f"Matrix_fits_{'-'.join(text_string.split(','))}.png"))
         self.update_plot.emit()
 
-    @staticmethod
-    def compare_to_reference(text_string, xaxis):
-        pce_vs_reference(eval('[' + text_string + ']'), xaxis)
+    def compare_to_reference(self, text_string, xaxis, by):
+        groups = eval('[' + text_string + ']') if text_string.strip() else None
+        try:
+            pce_vs_reference(self.session, groups, xaxis, paths['pv_improve_file'], None if by == 'all' else by)
+        except ValueError as err:  # e.g. no baseline fitted per the chosen column yet
+            self.load_edit.append(f'Calculation failed: {err}')
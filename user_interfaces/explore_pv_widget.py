@@ -2,17 +2,16 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import os
 from PyQt5 import QtCore, QtGui, QtWidgets
-import seaborn as sns
 
 from user_interfaces.widgets.separator import Separator
 from user_interfaces.widgets.treewidgetitem import ItemSignal, TreeWidgetItem
 from utility.colors import color_wheel
 from utility.config import paths, write_config
-from utility.dataframe_info import pv_explore_groups
-import utility.globals as glob
-from utility.load import load_global_df
-
-sns.set()
+from utility.dataframe_info import group_rows, pv_explore_groups
+from utility.load import load_session
+from utility.plot import set_style
+from utility.schema import fill_labels
+from utility.session import Session
 
 
 class ExplorePVWindow(QtWidgets.QMdiSubWindow):
@@ -38,6 +37,8 @@ class ExplorePVWidget(QtWidgets.QWidget):
     def __init__(self, parent):
         super(ExplorePVWidget, self).__init__(parent)
 
+        set_style()
+        self.session = Session()
         self.init_ui()
 
     def init_ui(self):
@@ -209,12 +210,12 @@ class ExplorePVWidget(QtWidgets.QWidget):
         QtWidgets.QApplication.clipboard().setPixmap(pixmap)
 
     def load_data(self):
-        load_global_df(paths['pv_explore'])
+        self.session = load_session(paths['pv_explore'])
         self.update_groups()
 
     def update_groups(self):
         self.group_list.clear()
-        entries = pv_explore_groups(glob.df)
+        entries = self.session.cached('explore_groups', pv_explore_groups)
         for entry in entries:
             group_item = TreeWidgetItem(ItemSignal(), self.group_list, entry)
             group_item.setToolTip(1, entry[1])
@@ -234,7 +235,7 @@ class ExplorePVWidget(QtWidgets.QWidget):
         self.plot_canvas.figure.clear()
         ax = self.plot_canvas.figure.add_subplot(111)
         for i, group in enumerate(groups):
-            df = glob.df[glob.df['group'] == int(group)].sort_values(by=xaxis)
+            df = self.session.df.iloc[group_rows(self.session, int(group), xaxis)]
             ls = '--' if df['QD Type'].mode()[0] == 'None' else '-'
             label = self.create_legend(df, legend)
             ax.fill_between(df[xaxis],
@@ -262,5 +263,5 @@ class ExplorePVWidget(QtWidgets.QWidget):
         for show, col in zip(legend, ['Matrix', 'QD Type', 'Nominal Emission (nm)', 'QD Concentration (mg/g)',
                                       'Solvent', 'Additives', 'Additive concentration (%)']):
             if show:
-                label.append(str(dframe[col].fillna('None').mode()[0]))
+                label.append(str(fill_labels(dframe[col]).mode()[0]))
         return " ".join(label)
@@ -0,0 +1,120 @@
+import threading
+import traceback
+from PyQt5 import QtCore
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobSignals(QtCore.QObject):
+    started = QtCore.pyqtSignal(str)
+    progress = QtCore.pyqtSignal(str, int, int)
+    finished = QtCore.pyqtSignal(str, object)
+    error = QtCore.pyqtSignal(str, str)
+    cancelled = QtCore.pyqtSignal(str)
+
+
+class Job(QtCore.QRunnable):
+    # runs fn(*args, **kwargs) off the GUI thread; with_progress passes a progress(done, total) callback, which is
+    # also where a running job notices it was cancelled
+
+    def __init__(self, name, fn, *args, with_progress=False, **kwargs):
+        super(Job, self).__init__()
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.with_progress = with_progress
+        self.started = False
+        self.signals = JobSignals()
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def report(self, done, total):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.signals.progress.emit(self.name, done, total)
+
+    def run(self):
+        if self._cancel.is_set():
+            self.signals.cancelled.emit(self.name)
+            return
+        self.signals.started.emit(self.name)
+        try:
+            if self.with_progress:
+                self.kwargs['progress'] = self.report
+            result = self.fn(*self.args, **self.kwargs)
+        except JobCancelled:
+            self.signals.cancelled.emit(self.name)
+        except Exception:
+            self.signals.error.emit(self.name, traceback.format_exc())
+        else:
+            self.signals.finished.emit(self.name, result)
+
+
+class JobQueue(QtCore.QObject):
+    # one worker thread per queue, so the steps a user queues up run in the order they were requested. Only jobs
+    # that report progress can stop while running, others only before they start; cancellable tells which applies
+    message = QtCore.pyqtSignal(str)
+    progress = QtCore.pyqtSignal(int, int)
+    busy = QtCore.pyqtSignal(bool)
+    cancellable = QtCore.pyqtSignal(bool)
+
+    def __init__(self, parent=None, max_threads=1):
+        super(JobQueue, self).__init__(parent)
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.jobs = list()
+        self.callbacks = dict()
+
+    def submit(self, name, fn, *args, on_finished=None, with_progress=False, **kwargs):
+        job = Job(name, fn, *args, with_progress=with_progress, **kwargs)
+        job.setAutoDelete(False)
+        job.signals.started.connect(lambda job_name: self.job_started(job))
+        job.signals.progress.connect(lambda job_name, done, total: self.progress.emit(done, total))
+        job.signals.finished.connect(lambda job_name, result: self.job_finished(job, result))
+        job.signals.error.connect(lambda job_name, text: self.job_done(job, f"{job_name}: failed\n{text}"))
+        job.signals.cancelled.connect(lambda job_name: self.job_done(job, f"{job_name}: cancelled"))
+        self.jobs.append(job)
+        self.callbacks[job] = on_finished
+        self.busy.emit(True)
+        if len(self.jobs) > 1:
+            self.message.emit(f"{name}: queued")
+        self.update_cancellable()
+        self.pool.start(job)
+        return job
+
+    def job_started(self, job):
+        job.started = True
+        self.message.emit(f"{job.name}: started")
+        self.update_cancellable()
+
+    def update_cancellable(self):
+        self.cancellable.emit(any(job.with_progress or not job.started for job in self.jobs))
+
+    def job_finished(self, job, result):
+        callback = self.callbacks.get(job)
+        self.job_done(job, f"{job.name}: done")
+        if callback:
+            callback(result)
+
+    def job_done(self, job, text):
+        self.message.emit(text)
+        self.callbacks.pop(job, None)
+        if job in self.jobs:
+            self.jobs.remove(job)
+        self.update_cancellable()
+        if not self.jobs:
+            self.progress.emit(0, 1)
+            self.busy.emit(False)
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            job.cancel()
+
+    def wait(self, msecs=-1):
+        self.cancel_all()
+        return self.pool.waitForDone(msecs)
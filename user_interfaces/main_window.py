@@ -1,13 +1,16 @@
 import ctypes
+import importlib
 import os
-from PyQt5 import QtWidgets, QtGui
+from PyQt5 import QtCore, QtGui, QtWidgets
 
-from user_interfaces.change_pv_widget import ChangePVWindow
-from user_interfaces.explore_pv_widget import ExplorePVWindow
-from user_interfaces.merge_pv_widget import MergePVWindow
-from user_interfaces.process_pv_widget import ProcessPVWindow
 from utility import config
 
+# window modules pull in matplotlib, seaborn and pandas, so each is only imported when its menu action is first used
+windows = {'process_pv': ('user_interfaces.process_pv_widget', 'ProcessPVWindow'),
+           'merge_pv': ('user_interfaces.merge_pv_widget', 'MergePVWindow'),
+           'change_pv': ('user_interfaces.change_pv_widget', 'ChangePVWindow'),
+           'explore_pv': ('user_interfaces.explore_pv_widget', 'ExplorePVWindow')}
+
 
 # noinspection PyAttributeOutsideInit
 class MainWindow(QtWidgets.QMainWindow):
@@ -15,8 +18,9 @@ class MainWindow(QtWidgets.QMainWindow):
     def __init__(self, parent=None):
         super(MainWindow, self).__init__(parent)
 
-        myappid = 'Lambda DA'  # arbitrary string
-        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
+        if hasattr(ctypes, 'windll'):  # taskbar icon grouping only exists on Windows
+            myappid = 'Lambda DA'  # arbitrary string
+            ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
         config.read_config()
         self.init_ui()
 
@@ -53,25 +57,27 @@ class MainWindow(QtWidgets.QMainWindow):
         microscope_menu = self.menuBar().addMenu('Microscopy')
         microscope_menu.addAction('Load Images')
 
+    def open_window(self, key):
+        module_name, class_name = windows[key]
+        QtWidgets.QApplication.setOverrideCursor(QtGui.QCursor(QtCore.Qt.WaitCursor))
+        try:
+            window = getattr(importlib.import_module(module_name), class_name)(self)
+        finally:
+            QtWidgets.QApplication.restoreOverrideCursor()
+        self.mdi.addSubWindow(window)
+        window.show()
+
     def process_pv(self):
-        process_pv_widget = ProcessPVWindow(self)
-        self.mdi.addSubWindow(process_pv_widget)
-        process_pv_widget.show()
+        self.open_window('process_pv')
 
     def merge_pv(self):
-        merge_pv_widget = MergePVWindow(self)
-        self.mdi.addSubWindow(merge_pv_widget)
-        merge_pv_widget.show()
+        self.open_window('merge_pv')
 
     def change_pv(self):
-        change_pv_widget = ChangePVWindow(self)
-        self.mdi.addSubWindow(change_pv_widget)
-        change_pv_widget.show()
+        self.open_window('change_pv')
 
     def explore_pv(self):
-        explore_pv_widget = ExplorePVWindow(self)
-        self.mdi.addSubWindow(explore_pv_widget)
-        explore_pv_widget.show()
+        self.open_window('explore_pv')
 
     def closeEvent(self, *args, **kwargs):
         super(QtWidgets.QMainWindow, self).closeEvent(*args, **kwargs)
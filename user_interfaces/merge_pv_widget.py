@@ -27,37 +27,33 @@ class MergePVWidget(QtWidgets.QWidget):
 
     def init_ui(self):
         vbox = QtWidgets.QVBoxLayout()
-        vbox.addWidget(QtWidgets.QLabel("Combine two existing, processed IV files into one.", self))
-        vbox.addWidget(QtWidgets.QLabel("1. Specify the files to be merged and the target folder for the "
-                                        "combined file.", self))
-
-        hbox_import1 = QtWidgets.QHBoxLayout()
-        hbox_import1.addWidget(QtWidgets.QLabel("File #1", self))
-        file1_button = QtWidgets.QPushButton(
-            QtGui.QIcon(os.path.join(paths['icons'], 'folder.png')), '')
-        file1_button.clicked.connect(lambda: self.file_dialog(origin=1))
-        file1_button.setToolTip('Choose first file')
-        hbox_import1.addWidget(file1_button)
-        self.file1_edit = QtWidgets.QLineEdit(paths['last_export'], self)
-        self.file1_edit.setMinimumWidth(180)
-        self.file1_edit.setDisabled(True)
-        hbox_import1.addWidget(self.file1_edit)
-        hbox_import1.addStretch(-1)
-        vbox.addLayout(hbox_import1)
-
-        hbox_import2 = QtWidgets.QHBoxLayout()
-        hbox_import2.addWidget(QtWidgets.QLabel("File #2", self))
-        file2_button = QtWidgets.QPushButton(
-            QtGui.QIcon(os.path.join(paths['icons'], 'folder.png')), '')
-        file2_button.clicked.connect(lambda: self.file_dialog(origin=2))
-        file2_button.setToolTip('Choose second file')
-        hbox_import2.addWidget(file2_button)
-        self.file2_edit = QtWidgets.QLineEdit(paths['last_export'], self)
-        self.file2_edit.setMinimumWidth(180)
-        self.file2_edit.setDisabled(True)
-        hbox_import2.addWidget(self.file2_edit)
-        hbox_import2.addStretch(-1)
-        vbox.addLayout(hbox_import2)
+        vbox.addWidget(QtWidgets.QLabel("Combine existing, processed IV files into one.", self))
+        vbox.addWidget(QtWidgets.QLabel("1. Add the files (or folders holding processed data) to be merged and "
+                                        "specify the target folder for the combined file.", self))
+
+        hbox_import = QtWidgets.QHBoxLayout()
+        self.inputs_list = QtWidgets.QListWidget(self)
+        self.inputs_list.setMinimumWidth(180)
+        self.inputs_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        hbox_import.addWidget(self.inputs_list)
+        vbox_buttons = QtWidgets.QVBoxLayout()
+        add_files_button = QtWidgets.QPushButton(
+            QtGui.QIcon(os.path.join(paths['icons'], 'folder.png')), 'Files')
+        add_files_button.clicked.connect(self.file_dialog)
+        add_files_button.setToolTip('Add processed files')
+        vbox_buttons.addWidget(add_files_button)
+        add_folder_button = QtWidgets.QPushButton(
+            QtGui.QIcon(os.path.join(paths['icons'], 'folder.png')), 'Folder')
+        add_folder_button.clicked.connect(self.input_folder_dialog)
+        add_folder_button.setToolTip('Add a folder holding processed data')
+        vbox_buttons.addWidget(add_folder_button)
+        remove_button = QtWidgets.QPushButton('Remove')
+        remove_button.clicked.connect(self.remove_inputs)
+        remove_button.setToolTip('Remove the selected entries')
+        vbox_buttons.addWidget(remove_button)
+        vbox_buttons.addStretch(-1)
+        hbox_import.addLayout(vbox_buttons)
+        vbox.addLayout(hbox_import)
 
         hbox_export = QtWidgets.QHBoxLayout()
         hbox_export.addWidget(QtWidgets.QLabel("Output folder", self))
@@ -75,13 +71,16 @@ class MergePVWidget(QtWidgets.QWidget):
 
         vbox.addWidget(Separator())
         vbox.addWidget(QtWidgets.QLabel("2. Create combined file in the target folder.\n"
-                                        "Groups will be reassigned and indices reset.\n"
+                                        "Rows are combined in time order, groups are assigned from the film "
+                                        "properties and indices reset.\n"
                                         "If file name exists, the combined file will be named "
-                                        "\'Processed IV(1).xlsx\'.", self))
+                                        "\'Processed_IV(1)\', \'Processed_IV(2)\', ...", self))
         hbox_merge = QtWidgets.QHBoxLayout()
         merge_button = QtWidgets.QPushButton("Merge Data")
         hbox_merge.addWidget(merge_button)
         merge_button.clicked.connect(self.merge_data)
+        self.merge_label = QtWidgets.QLabel('', self)
+        hbox_merge.addWidget(self.merge_label)
         hbox_merge.addStretch(-1)
         vbox.addLayout(hbox_merge)
         vbox.addStretch(-1)
@@ -91,12 +90,27 @@ class MergePVWidget(QtWidgets.QWidget):
         path = str(QtWidgets.QFileDialog.getExistingDirectory(self, 'Select Directory', paths['last_export']))
         self.save_folder_edit.setText(path)
 
-    def file_dialog(self, origin):
-        path = str(QtWidgets.QFileDialog.getOpenFileName(self, 'Select File', paths['last_export'])[0])
-        if origin == 1:
-            self.file1_edit.setText(path)
-        elif origin == 2:
-            self.file2_edit.setText(path)
+    def file_dialog(self):
+        files = QtWidgets.QFileDialog.getOpenFileNames(self, 'Select Files', paths['last_export'])[0]
+        self.inputs_list.addItems([str(path) for path in files])
+
+    def input_folder_dialog(self):
+        path = str(QtWidgets.QFileDialog.getExistingDirectory(self, 'Select Directory', paths['last_export']))
+        if path:
+            self.inputs_list.addItem(path)
+
+    def remove_inputs(self):
+        for item in self.inputs_list.selectedItems():
+            self.inputs_list.takeItem(self.inputs_list.row(item))
 
     def merge_data(self):
-        merge_processed_data(self.file1_edit.text(), self.file2_edit.text(), self.save_folder_edit.text())
+        inputs = [self.inputs_list.item(row).text() for row in range(self.inputs_list.count())]
+        if not inputs:
+            self.merge_label.setText('Nothing to merge')
+            return
+        try:
+            save_path = merge_processed_data(inputs, self.save_folder_edit.text())
+        except (OSError, ValueError) as err:
+            self.merge_label.setText(f'Merge failed: {err}')
+            return
+        self.merge_label.setText(f'Saved {os.path.basename(save_path)}')
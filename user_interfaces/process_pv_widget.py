@@ -3,20 +3,44 @@ import matplotlib.dates as mdates
 from matplotlib.figure import Figure
 import os
 from PyQt5 import QtCore, QtGui, QtWidgets
-import seaborn as sns
 
+from user_interfaces.jobs import JobQueue
 from user_interfaces.widgets.separator import Separator
+from utility.checkpoint import export_excel
 from utility.colors import color_wheel
 from utility.config import paths, defaults, write_config
 from utility.corrections import iv_temperature_correction, iv_irradiance_fit, iv_irradiance_correction
 from utility.dataframe_edit import drop_experiments, select_experiment_range, merge_film_db
 from utility.dataframe_info import df_info
-import utility.globals as glob
+from utility.instrument import format_record, profile_summary, write_report
 from utility.load import load_experiments
-from utility.plot import plot_ty
+from utility.plot import plot_ty, set_style
 from utility.process import average_by_experiment, average_by, calc_efficiency
+from utility.session import Session
 
-sns.set()
+
+# run on the job thread: callbacks get copies and counts rather than reading the session a later job may change
+def counted(fn):
+    def run(session, *args, **kwargs):
+        return len(fn(session, *args, **kwargs).df.index)
+    return run
+
+
+def load_and_describe(session, path, overwrite, progress=None):
+    load_experiments(session, path, overwrite, progress=progress)
+    return df_info(session.df), None if session.memory_report is None else session.memory_report.to_string()
+
+
+def plot_snapshot(session, columns, name=None):
+    df = session.df if name is None else session.df[session.df['name'] == name]
+    return df[columns].copy(), session.export_path
+
+
+def irradiance_fit_snapshot(session, baseline, channel):
+    y_pred = iv_irradiance_fit(session, baseline, channel)
+    df = session.df[session.df['name'] == baseline].dropna()  # the rows the fit used
+    columns = ['name', 'datetime', f'irrad{channel}', 'isc_fit', 'voc_fit', 'pmax_fit']
+    return y_pred, [list(pars) for pars in session.irrad_fit_pars], df[columns].copy(), session.export_path
 
 
 class ProcessPVWindow(QtWidgets.QMdiSubWindow):
@@ -30,6 +54,7 @@ class ProcessPVWindow(QtWidgets.QMdiSubWindow):
         self.setObjectName('PROC_PV')
 
     def closeEvent(self, *args, **kwargs):
+        self.Widget.jobs.wait()
         super(QtWidgets.QMdiSubWindow, self).closeEvent(*args, **kwargs)
 
         write_config()
@@ -45,6 +70,9 @@ class ProcessPVWidget(QtWidgets.QWidget):
     def __init__(self, parent):
         super(ProcessPVWidget, self).__init__(parent)
 
+        set_style()
+        self.session = Session()
+        self.jobs = JobQueue(self)
         hbox = QtWidgets.QHBoxLayout()
         self.Stack = QtWidgets.QStackedWidget(self)
         self.stack01_import = QtWidgets.QWidget()
@@ -100,7 +128,7 @@ class ProcessPVWidget(QtWidgets.QWidget):
         vbox.addLayout(hbox_export)
 
         vbox.addWidget(Separator())
-        vbox.addWidget(QtWidgets.QLabel("3. Load the IV data into the data frame and generate a summary Excel sheet.",
+        vbox.addWidget(QtWidgets.QLabel("3. Load the IV data into the data frame and generate a summary checkpoint.",
                                         self))
         hbox_load = QtWidgets.QHBoxLayout()
         load_button = QtWidgets.QPushButton("Load Data")
@@ -145,8 +173,37 @@ class ProcessPVWidget(QtWidgets.QWidget):
         vbox.addLayout(hbox_range)
 
         vbox.addWidget(Separator())
+        hbox_log = QtWidgets.QHBoxLayout()
         self.load_edit = QtWidgets.QTextEdit("", self)
-        vbox.addWidget(self.load_edit)
+        self.jobs.message.connect(self.load_edit.append)
+        hbox_log.addWidget(self.load_edit)
+        self.stage_log = QtWidgets.QTextEdit("", self)
+        self.stage_log.setReadOnly(True)
+        self.stage_log.setToolTip('Time, rows and frame memory of each processing stage')
+        self.n_logged = 0
+        self.jobs.message.connect(lambda _: self.show_stage_log())
+        hbox_log.addWidget(self.stage_log)
+        vbox.addLayout(hbox_log)
+        hbox_jobs = QtWidgets.QHBoxLayout()
+        self.job_progress = QtWidgets.QProgressBar(self)
+        self.job_progress.setTextVisible(False)
+        self.job_progress.setMaximumHeight(12)
+        self.jobs.progress.connect(self.show_progress)
+        hbox_jobs.addWidget(self.job_progress)
+        cancel_button = QtWidgets.QPushButton("Cancel")
+        cancel_button.setToolTip('Cancel the queued steps, and the running one if it reports progress')
+        cancel_button.setEnabled(False)
+        cancel_button.clicked.connect(self.jobs.cancel_all)
+        self.jobs.cancellable.connect(cancel_button.setEnabled)
+        hbox_jobs.addWidget(cancel_button)
+        profile_cbox = QtWidgets.QCheckBox("Profile")
+        profile_cbox.setToolTip('Run the stages under cProfile')
+        profile_cbox.toggled.connect(lambda checked: setattr(self.session, 'profile', checked))
+        hbox_jobs.addWidget(profile_cbox)
+        report_button = QtWidgets.QPushButton("Save Report")
+        report_button.clicked.connect(self.save_report)
+        hbox_jobs.addWidget(report_button)
+        vbox.addLayout(hbox_jobs)
 
         hbox_back_next = QtWidgets.QHBoxLayout()
         hbox_back_next.addStretch(-1)
@@ -420,6 +477,19 @@ class ProcessPVWidget(QtWidgets.QWidget):
         merge_button.clicked.connect(lambda: self.merge_film_data(overwrite=overwrite_merge_cbox.isChecked()))
         hbox_import.addStretch(-1)
         vbox.addLayout(hbox_import)
+
+        vbox.addWidget(Separator())
+        vbox.addWidget(QtWidgets.QLabel("15. Export the current data to an Excel sheet in the output folder.", self))
+        hbox_export = QtWidgets.QHBoxLayout()
+        hbox_export.addWidget(QtWidgets.QLabel("File name", self))
+        export_name_edit = QtWidgets.QLineEdit('Processed_IV', self)
+        export_name_edit.setFixedWidth(150)
+        hbox_export.addWidget(export_name_edit)
+        export_button = QtWidgets.QPushButton("Export")
+        export_button.clicked.connect(lambda: self.export_data(export_name_edit.text()))
+        hbox_export.addWidget(export_button)
+        hbox_export.addStretch(-1)
+        vbox.addLayout(hbox_export)
         vbox.addStretch(-1)
 
         hbox_back_next = QtWidgets.QHBoxLayout()
@@ -438,119 +508,152 @@ class ProcessPVWidget(QtWidgets.QWidget):
         elif path == 'last_export':
             self.save_folder_edit.setText(paths[path])
 
+    def show_progress(self, done, total):
+        self.job_progress.setMaximum(total)
+        self.job_progress.setValue(done)
+
+    def show_stage_log(self):
+        for record in self.session.report[self.n_logged:]:
+            self.stage_log.append(format_record(record))
+            if 'profile' in record:
+                self.stage_log.append(profile_summary(record['profile']))
+        self.n_logged = len(self.session.report)
+
+    def save_report(self):
+        self.stage_log.append(f"Saved run report to {write_report(self.session)}")
+
+    def report_rows(self, n_rows):
+        self.load_edit.append(f"{n_rows} rows")
+
     def load_data(self, path, overwrite):
         defaults['process_pv'][0] = overwrite
 
-        load_experiments(path, overwrite)
-        self.load_edit.append(df_info(glob.df))
+        self.jobs.submit('Load data', load_and_describe, self.session, path, overwrite, with_progress=True,
+                         on_finished=self.show_loaded)
+
+    def show_loaded(self, description):
+        info, memory = description
+        self.load_edit.append(info)
+        if memory is not None:
+            self.load_edit.append(f"Memory after compacting dtypes:\n{memory}")
 
-    @staticmethod
-    def exclude_data(text_string):
-        drop_experiments(eval('[' + text_string + ']'))
+    def exclude_data(self, text_string):
+        self.jobs.submit('Exclude experiments', counted(drop_experiments), self.session, eval('[' + text_string + ']'),
+                         on_finished=self.report_rows)
 
-    @staticmethod
-    def select_range(idxmin, idxmax):
-        select_experiment_range(idxmin, idxmax)
+    def select_range(self, idxmin, idxmax):
+        self.jobs.submit('Select range', counted(select_experiment_range), self.session, idxmin, idxmax,
+                         on_finished=self.report_rows)
 
+    # the show steps queue behind running jobs and copy the columns they plot on the job thread, so the drawing on the
+    # GUI thread never sees a frame that a later job is changing
     def show_t_data(self, baseline):
         defaults['process_pv'][1] = baseline
+        self.jobs.submit('Temperature plots', plot_snapshot, self.session, ['name', 'datetime', 't_sample', 'voc_fit'],
+                         on_finished=lambda snapshot: self.draw_t_data(*snapshot, baseline))
 
+    def draw_t_data(self, df, folder, baseline):
         self.t_hist_canvas.figure.clear()
         t_hist_ax = self.t_hist_canvas.figure.add_subplot(111)
-        t_hist_ax.hist(glob.df['t_sample'], bins=20, color=color_wheel[1])
+        t_hist_ax.hist(df['t_sample'], bins=20, color=color_wheel[1])
         t_hist_ax.set_xlabel(r'Temperature ($^o$C)')
         t_hist_ax.set_ylabel("Counts")
         self.t_hist_canvas.figure.tight_layout(pad=0.3)
-        self.t_hist_canvas.figure.savefig(os.path.join(paths['last_export'], 'Temp_histogram.png'))
+        self.t_hist_canvas.figure.savefig(os.path.join(folder, 'Temp_histogram.png'))
         self.update_t_hist.emit()
 
         self.voc_t_canvas.figure.clear()
         voc_t_ax = self.voc_t_canvas.figure.add_subplot(111)
-        mask = glob.df['name'] == baseline
-        voc_t_ax.scatter(glob.df[mask]['t_sample'], glob.df[mask]['voc_fit'], color=color_wheel[2], s=6)
+        df_baseline = df[df['name'] == baseline]
+        voc_t_ax.scatter(df_baseline['t_sample'], df_baseline['voc_fit'], color=color_wheel[2], s=6)
         voc_t_ax.set_xlabel(r'Temperature ($^o$C)')
         voc_t_ax.set_ylabel("Voc (V)")
         self.voc_t_canvas.figure.tight_layout(pad=0.3)
-        self.voc_t_canvas.figure.savefig(os.path.join(paths['last_export'], 'Temp_vs_Voc.png'))
+        self.voc_t_canvas.figure.savefig(os.path.join(folder, 'Temp_vs_Voc.png'))
         self.update_voc_t.emit()
 
-        plot_ty(baseline, 't_sample')
+        plot_ty(df, baseline, 't_sample', folder)
 
-    @staticmethod
-    def apply_temp_corr(overwrite):
+    def apply_temp_corr(self, overwrite):
         defaults['process_pv'][2] = overwrite
-        iv_temperature_correction(overwrite)
+        self.jobs.submit('Temperature correction', counted(iv_temperature_correction), self.session, overwrite,
+                         on_finished=self.report_rows)
 
     def show_irrad_data(self, baseline, channel):
         defaults['process_pv'][1] = baseline
         defaults['process_pv'][3] = channel
-        y_pred = iv_irradiance_fit(baseline, channel)
-        mask = glob.df['name'] == baseline
+        self.jobs.submit('Irradiance fit', irradiance_fit_snapshot, self.session, baseline, channel,
+                         on_finished=lambda snapshot: self.draw_irrad_data(*snapshot, baseline, channel))
 
+    def draw_irrad_data(self, y_pred, fit_pars, df, folder, baseline, channel):
         self.irrad_canvas.figure.clear()
         axes = [None, None, None]
         for i, key in zip(range(3), ['isc_fit', 'voc_fit', 'pmax_fit']):
             axes[i] = self.irrad_canvas.figure.add_subplot(1, 3, i+1)
-            glob.df[mask].dropna().plot(x=f'irrad{channel}', y=key, kind='scatter', s=8,
-                                        color=color_wheel[1], ax=axes[i])
-            axes[i].plot(glob.df[mask][f'irrad{channel}'], y_pred[i], color=color_wheel[2])
+            df.plot(x=f'irrad{channel}', y=key, kind='scatter', s=8, color=color_wheel[1], ax=axes[i])
+            axes[i].plot(df[f'irrad{channel}'], y_pred[i], color=color_wheel[2])
             axes[i].set_xlabel(f'irrad{channel}')
             axes[i].set_ylabel(key)
         self.irrad_canvas.figure.tight_layout(pad=0.3)
-        self.irrad_canvas.figure.savefig(os.path.join(paths['last_export'], 'Irradiance_fits.png'))
+        self.irrad_canvas.figure.savefig(os.path.join(folder, 'Irradiance_fits.png'))
         self.update_irrad.emit()
 
-        plot_ty(baseline, f'irrad{channel}')
+        plot_ty(df, baseline, f'irrad{channel}', folder)
 
-        self.isc_edit.setText(f"{glob.irrad_fit_pars[0][0]:.2f} * irrad{channel} + {glob.irrad_fit_pars[0][1]:.2f}")
-        self.voc_edit.setText(f"{glob.irrad_fit_pars[1][0]:.2f} * irrad{channel} + {glob.irrad_fit_pars[1][1]:.2f}")
-        self.pmax_edit.setText(f"{glob.irrad_fit_pars[2][0]:.2f} * irrad{channel} + {glob.irrad_fit_pars[2][1]:.2f}")
+        self.isc_edit.setText(f"{fit_pars[0][0]:.2f} * irrad{channel} + {fit_pars[0][1]:.2f}")
+        self.voc_edit.setText(f"{fit_pars[1][0]:.2f} * irrad{channel} + {fit_pars[1][1]:.2f}")
+        self.pmax_edit.setText(f"{fit_pars[2][0]:.2f} * irrad{channel} + {fit_pars[2][1]:.2f}")
 
-    @staticmethod
-    def apply_irrad_corr(channel, one_sun, overwrite):
+    def apply_irrad_corr(self, channel, one_sun, overwrite):
         defaults['process_pv'][3] = channel
         defaults['process_pv'][4] = one_sun
         defaults['process_pv'][5] = overwrite
-        iv_irradiance_correction(channel, float(one_sun), overwrite)
+        self.jobs.submit('Irradiance correction', counted(iv_irradiance_correction), self.session, channel,
+                         float(one_sun), overwrite, on_finished=self.report_rows)
 
-    @staticmethod
-    def avg_exp_data(overwrite):
+    def avg_exp_data(self, overwrite):
         defaults['process_pv'][6] = overwrite
-        average_by_experiment(overwrite)
+        self.jobs.submit('Average experiments', counted(average_by_experiment), self.session, overwrite,
+                         on_finished=self.report_rows)
 
     def show_avg_exp_data(self, name, yaxis_name):
         defaults['process_pv'][7] = name
+        self.jobs.submit('Time plot', plot_snapshot, self.session, ['datetime', yaxis_name, f"d{yaxis_name}"], name,
+                         on_finished=lambda snapshot: self.draw_avg_exp_data(*snapshot, name, yaxis_name))
 
-        mask = glob.df['name'] == name
-
+    def draw_avg_exp_data(self, df, folder, name, yaxis_name):
         self.time_canvas.figure.clear()
         ax = self.time_canvas.figure.add_subplot(111)
-        ax.errorbar(glob.df[mask]['datetime'], glob.df[mask][yaxis_name], yerr=glob.df[mask][f"d{yaxis_name}"],
+        ax.errorbar(df['datetime'], df[yaxis_name], yerr=df[f"d{yaxis_name}"],
                     ecolor=color_wheel[0], elinewidth=1.5, capsize=3,
                     color=color_wheel[1], lw=3, marker='s', ms=8)
         ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
         ax.set_xlabel('Time (hs)')
         ax.set_ylabel(yaxis_name)
         self.time_canvas.figure.tight_layout(pad=0.3)
-        self.time_canvas.figure.savefig(os.path.join(paths['last_export'], f'{name}_time_vs_{yaxis_name}.png'))
+        self.time_canvas.figure.savefig(os.path.join(folder, f'{name}_time_vs_{yaxis_name}.png'))
         self.update_time_dep.emit()
 
-    @staticmethod
-    def avg_film_data(col_name, overwrite):
+    def avg_film_data(self, col_name, overwrite):
         defaults['process_pv'][8] = overwrite
-        average_by(col_name, overwrite)
+        self.jobs.submit('Average films', counted(average_by), self.session, col_name, overwrite,
+                         on_finished=self.report_rows)
 
-    @staticmethod
-    def efficiency_data(name, overwrite):
+    def efficiency_data(self, name, overwrite):
         defaults['process_pv'][9] = name
         defaults['process_pv'][10] = overwrite
-        calc_efficiency(name, overwrite)
+        self.jobs.submit('Efficiency', counted(calc_efficiency), self.session, name, overwrite,
+                         on_finished=self.report_rows)
 
     def file_dialog(self):
         paths['film_db'] = str(QtWidgets.QFileDialog.getOpenFileName(self, 'Select Film', paths['film_db'])[0])
         self.film_path_edit.setText(paths['film_db'])
 
-    @staticmethod
-    def merge_film_data(overwrite):
+    def merge_film_data(self, overwrite):
         defaults['process_pv'][11] = overwrite
-        merge_film_db(overwrite)
+        self.jobs.submit('Merge film database', counted(merge_film_db), self.session, overwrite,
+                         on_finished=self.report_rows)
+
+    def export_data(self, fname):
+        self.jobs.submit('Export', lambda: export_excel(self.session.df, os.path.join(self.session.export_path, fname)),
+                         on_finished=lambda path: self.load_edit.append(f"Exported current data to {path}"))
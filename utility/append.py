@@ -0,0 +1,123 @@
+import functools
+import json
+import os
+import pandas as pd
+
+from utility.checkpoint import load_stage, save_stage, stage_exists
+from utility.corrections import corrected, temperature_coefficients
+from utility.dataframe_edit import experiments_dropped, experiments_in_range, film_db_merged
+from utility.film_db import film_table
+from utility.group_registry import GroupRegistry
+from utility.instrument import instrumented
+from utility.load import find_summaries, in_walk_order, manifest_name, read_manifest, summaries_frame, \
+    unchanged_keys, write_manifest
+from utility.process import averages_by, efficiencies, experiment_averages
+from utility.schema import compact_frame
+
+# Append mode: experiment folders missing from the load manifest, or changed since it was written, go through the
+# chain with the parameters recorded by the last full run (fit parameters, efficiency reference); their rows replace
+# any stored for the same folder key. Only these sweeps are parsed and corrected; the per experiment tables
+# downstream are small and are rebuilt whole.
+
+record_name = 'processing_record.json'
+
+
+def read_record(folder):
+    path = os.path.join(folder, record_name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_record(folder, record):
+    with open(os.path.join(folder, record_name), 'w') as f:
+        json.dump(record, f, indent=1)
+
+
+def append_stage(df, stage, folder, arrange=None, replace=()):
+    # stored rows of the folder keys in replace are dropped; arrange puts the combined rows in the order a full run
+    # would give them
+    if stage_exists(stage, folder):
+        stored = load_stage(stage, folder)
+        stored = stored[~stored.index.get_level_values(0).isin(list(replace))]
+        df = pd.concat([stored, df])
+        df = compact_frame(df if arrange is None else arrange(df))
+    save_stage(df, stage, folder)
+    return df
+
+
+def selected(df, record):
+    # the experiments the last full run kept
+    if record.get('drop'):
+        df = experiments_dropped(df, record['drop'])
+    if record.get('range'):
+        df = experiments_in_range(df, *record['range'])
+    return df
+
+
+def final_stage(record):
+    # the stage holding the frame the recorded chain ends with
+    stages = ['IV_Summary']
+    if record.get('temperature') or record.get('irradiance'):
+        stages.append('IV_Summary_TI_corr' if record.get('irradiance') else 'IV_Summary_T_corr')
+    if record.get('average') is not None:
+        stages.append('IV_Summary_Average')
+        if record['average'].get('by'):
+            stages.append('IV_Summary_Average_by_Film')
+        if record.get('efficiency'):
+            stages.append('IV_Summary_Efficiency')
+        if record.get('film_db'):
+            stages.append('Processed_IV')
+    return stages[-1]
+
+
+def appended(session, df, record, walk_order, replace):
+    # runs the recorded chain on the new rows and adds them to the stored stages, returns the final frame
+    folder = session.export_path
+    append_stage(df, 'IV_Summary', folder, walk_order, replace)
+    df = selected(df, record)
+    temperature = temperature_coefficients if record.get('temperature') else None
+    section = record.get('irradiance')
+    irradiance = (section['channel'], section['one_sun'], section['fit_pars']) if section else None
+    if temperature or irradiance:
+        df = corrected(df, temperature, irradiance)
+        append_stage(df, 'IV_Summary_TI_corr' if irradiance else 'IV_Summary_T_corr', folder, walk_order,
+                     replace)
+    if record.get('average') is None:
+        return df
+
+    df = append_stage(experiment_averages(df), 'IV_Summary_Average', folder, pd.DataFrame.sort_index, replace)
+    if record['average'].get('by'):
+        df = averages_by(df, record['average']['by'])
+        save_stage(df, 'IV_Summary_Average_by_Film', folder)
+    if record.get('efficiency'):
+        df = efficiencies(df, record['efficiency']['reference'], record['efficiency']['values'])
+        save_stage(df, 'IV_Summary_Efficiency', folder)
+    if record.get('film_db'):
+        registry = GroupRegistry.open(folder)
+        df = film_db_merged(df, film_table(session.film_db), registry)
+        save_stage(df, 'Processed_IV', folder)
+        registry.save()
+    return df
+
+
+@instrumented('append_experiments')
+def append_experiments(session, path, record, workers=None, progress=None):
+    folder = session.export_path
+    manifest = read_manifest(os.path.join(folder, manifest_name))
+    summaries = find_summaries(path, exclude=os.path.join(folder, 'IV_Summary.xlsx'))
+    unchanged = unchanged_keys(summaries, manifest, path, session.timezone)
+    new = [entry for entry in summaries if entry['key'] not in unchanged]
+    if not new:
+        # nothing to add: the session holds what the last run ended with
+        stage = final_stage(record)
+        df = load_stage(stage, folder)
+        session.df = selected(df, record) if stage == 'IV_Summary' else df
+        return session
+    replace = {entry['key'] for entry in new}  # changed folders: their earlier rows are dropped
+    df = compact_frame(summaries_frame(new, session.timezone, workers, progress))
+    session.df = appended(session, df, record, functools.partial(in_walk_order, summaries=summaries), replace)
+    # recorded only once every stage holds the new folders, so a failed run is picked up again by the next one
+    write_manifest(os.path.join(folder, manifest_name), path, new, session.timezone, manifest.get('files', {}))
+    return session
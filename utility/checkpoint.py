@@ -0,0 +1,125 @@
+import os
+import pandas as pd
+
+from utility.config import defaults
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# number of index columns to restore when a stage is read back from Excel
+excel_index_levels = {'IV_Summary': 3, 'IV_Summary_T_corr': 3, 'IV_Summary_TI_corr': 3}  # key, exp_no, row
+
+
+def _read_parquet(path, index_levels=1):
+    return pd.read_parquet(path)
+
+
+def _write_parquet(df, path):
+    if pyarrow is None:
+        df.to_parquet(path)
+        return path
+    try:
+        df.to_parquet(path)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError):
+        # object columns mixing numbers and strings (typical for the film database) cannot be stored in Parquet
+        if os.path.exists(path):
+            os.remove(path)
+        path = os.path.splitext(path)[0] + backends['pickle'][0]
+        _write_pickle(df, path)
+    return path
+
+
+def _read_pickle(path, index_levels=1):
+    return pd.read_pickle(path)
+
+
+def _write_pickle(df, path):
+    df.to_pickle(path)
+    return path
+
+
+def _read_excel(path, index_levels=1):
+    if index_levels > 2:
+        # sheets written before the exp_no level existed have (key, row) only
+        header = pd.read_excel(path, nrows=0).columns[:index_levels]
+        if 'exp_no' not in header:
+            index_levels = 2
+    return pd.read_excel(path, index_col=list(range(index_levels)))
+
+
+def _write_excel(df, path):
+    df.to_excel(path)
+    return path
+
+
+backends = {'parquet': ('.parquet', _read_parquet, _write_parquet),
+            'pickle': ('.pkl', _read_pickle, _write_pickle),
+            'excel': ('.xlsx', _read_excel, _write_excel)}
+
+
+def default_backend():
+    backend = defaults.get('checkpoint', 'parquet')
+    if backend == 'parquet' and pyarrow is None:
+        return 'pickle'
+    return backend
+
+
+def stage_path(stage, folder, backend=None):
+    return os.path.join(folder, stage + backends[backend or default_backend()][0])
+
+
+def find_stage(stage, folder):
+    backend = default_backend()
+    for name in [backend] + [key for key in backends if key != backend]:
+        path = stage_path(stage, folder, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def stage_exists(stage, folder):
+    return find_stage(stage, folder) is not None
+
+
+def remove_stage(stage, folder):
+    for backend in backends:
+        if os.path.exists(stage_path(stage, folder, backend)):
+            os.remove(stage_path(stage, folder, backend))
+
+
+def load_stage(stage, folder):
+    return read_frame(find_stage(stage, folder), excel_index_levels.get(stage, 1))
+
+
+def save_stage(df, stage, folder, backend=None):
+    remove_stage(stage, folder)
+    return write_frame(df, stage_path(stage, folder, backend))
+
+
+def backend_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    for name, (backend_extension, reader, writer) in backends.items():
+        if extension == backend_extension:
+            return name
+    if extension == '.xls':
+        return 'excel'
+    raise ValueError(f"Unknown data file type '{extension}'")
+
+
+def read_frame(path, index_levels=1):
+    return backends[backend_for(path)][1](path, index_levels)
+
+
+def write_frame(df, path):
+    if os.path.exists(path):
+        os.remove(path)  # never rewritten in place, stage checkpoints may be hard linked into the stage cache
+    return backends[backend_for(path)][2](df, path)
+
+
+def export_excel(df, path):
+    if not path.lower().endswith('.xlsx'):
+        path = os.path.splitext(path)[0] + '.xlsx'
+    df.to_excel(path)
+    return path
@@ -10,7 +10,10 @@ global_confs = {'progname': 'Lambda DA',
                 'progversion': __version__}
 
 defaults = {'process_pv': [False, 'PV masked', False, 2, 515, False, False, 'PV masked', False, 'PV masked', False,
-                           False]}
+                           False],
+            'checkpoint': 'parquet',
+            'stage_cache': 32,
+            'timezone': 'Europe/London'}
 #             'iv': [-0.01, 0.7, 0.005, 142, 0.5, 5, 0.025, 5, 2.0, 1, 30.0]}
 
 paths = {'icons': os.path.join(PROJECT_PATH, 'icons'),
@@ -43,7 +46,10 @@ def write_config():
                          'progversion': global_confs['progversion']
                          }
 
-    config['defaults'] = {'process_pv': defaults['process_pv']}
+    config['defaults'] = {'process_pv': defaults['process_pv'],
+                          'checkpoint': repr(defaults['checkpoint']),
+                          'stage_cache': defaults['stage_cache'],
+                          'timezone': repr(defaults['timezone'])}
     #                       'iv': defaults['iv']}
 
     config['paths'] = {'icons': os.path.join(PROJECT_PATH, 'icons'),
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+from utility.config import defaults
+
+# Epoch seconds from the solar simulator become wall clock time in one explicit time zone, so every machine that
+# processes the data gets the same datetimes regardless of its own locale. The result is timezone naive, which is
+# what Excel export and the plot date formatters expect.
+
+
+def epoch_to_datetime(timestamps, tz=None):
+    times = pd.to_datetime(np.asarray(timestamps, dtype=float), unit='s', utc=True)
+    return times.tz_convert(tz or defaults['timezone']).tz_localize(None)
+
+
+def timestamp_to_datetime_hour(timestamps, tz=None):
+    if np.ndim(timestamps) == 0:
+        return timestamp_to_datetime_hour([timestamps], tz)[0]
+    return np.asarray(epoch_to_datetime(timestamps, tz).strftime('%H:%M:%S'), dtype=object)
@@ -1,65 +1,101 @@
 import numpy as np
-import os
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-
-from utility.config import paths
-import utility.globals as glob
-
-
-def iv_temperature_correction(overwrite=False):
-    if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_T_corr.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'IV_Summary_T_corr.xlsx'), index_col=[0, 1])
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_T_corr.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'IV_Summary_T_corr.xlsx'))
-        glob.df.loc[:, ['isc_fit']] = glob.df['isc_fit'] * (1 + 0.0006 * (25 - glob.df['t_sample']))
-        glob.df.loc[:, ['voc_fit']] = glob.df['voc_fit'] - 2.2 * (25 - glob.df['t_sample'])
-        glob.df.loc[:, ['pmax_fit']] = glob.df['pmax_fit'] * (1 - 0.0045 * (25 - glob.df['t_sample']))
-        glob.df.to_excel(os.path.join(paths['last_export'], 'IV_Summary_T_corr.xlsx'))
-
-
-def iv_irradiance_fit(name, channel):
-    mask = glob.df['name'] == name
-    glob.irrad_fit_pars = list()
-    y_pred = list()
-    for key in ['isc_fit', 'voc_fit', 'pmax_fit']:
-        x = glob.df[mask].dropna()[f'irrad{channel}'].values.reshape(-1, 1)  # values converts it into a numpy array
-        y = glob.df[mask].dropna()[key].values.reshape(-1, 1)  # values converts it into a numpy array
-        lin_reg = LinearRegression()  # create object for the class
-        lin_reg.fit(x, y)  # perform linear regression
-        y_pred.append(lin_reg.predict(x))
-        glob.irrad_fit_pars.append([lin_reg.coef_[0, 0], lin_reg.intercept_[0]])
-    return y_pred
-
-
-def iv_irradiance_correction(channel, one_sun, overwrite):
-    if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_TI_corr.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'IV_Summary_TI_corr.xlsx'), index_col=[0, 1])
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_TI_corr.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'IV_Summary_TI_corr.xlsx'))
-        glob.df.loc[:, ['isc_fit']] = glob.df['isc_fit'] + (glob.irrad_fit_pars[0][0] if glob.irrad_fit_pars[0][0] > 0
-                                                            else 0) * (one_sun - glob.df[f'irrad{channel}'])
-        glob.df.loc[:, ['voc_fit']] = glob.df['voc_fit'].values.reshape(-1, 1) + \
-                                      (glob.irrad_fit_pars[1][0] if glob.irrad_fit_pars[1][0] > 0 else 0) * \
-                                      (np.log(one_sun) - np.log(glob.df[f'irrad{channel}'].values.reshape(-1, 1)))
-        glob.df.loc[:, ['pmax_fit']] = glob.df['pmax_fit'] + (glob.irrad_fit_pars[2][0] if glob.irrad_fit_pars[2][0] > 0
-                                                              else 0) * (one_sun - glob.df[f'irrad{channel}'])
-        glob.df.to_excel(os.path.join(paths['last_export'], 'IV_Summary_TI_corr.xlsx'))
-
-
-def reference_fit(groups, xaxis):
-    mask_mx = glob.df['group'].isin(groups)
-    df_fit = glob.df[mask_mx].sort_values(by=xaxis)
-    glob.irrad_fit_pars = list()
-    y_pred = list()
-    for key in ['isc_eff', 'pmax_eff']:
-        x = df_fit[xaxis].values.reshape(-1, 1)  # values converts it into a numpy array
-        y = df_fit[key].values.reshape(-1, 1)  # values converts it into a numpy array
-        yerr = df_fit[f"d{key}"].values.reshape(-1, 1).flatten()  # values converts it into a numpy array
-        lin_reg = LinearRegression()  # create object for the class
-        lin_reg.fit(x, y, sample_weight=1/yerr)  # perform linear regression
-        y_pred.append(lin_reg.predict(x))
-        glob.irrad_fit_pars.append([lin_reg.coef_[0, 0], lin_reg.intercept_[0]])
-    return y_pred
+
+from utility.instrument import instrumented
+from utility.regression import grouped_linear_fit, linear_fit
+from utility.stage_cache import run_stage
+
+iv_columns = ['isc_fit', 'voc_fit', 'pmax_fit']
+# per kelvin below 25 C: relative for isc and pmax, absolute for voc
+temperature_coefficients = (0.0006, 2.2, 0.0045)
+
+
+def corrected(df, temperature=None, irradiance=None):
+    # temperature: coefficients for isc, voc and pmax; irradiance: (channel, one_sun, fit_pars). Both corrections
+    # run in place on one copy of each column, which is written back once
+    isc, voc, pmax = [df[col].to_numpy(copy=True) for col in iv_columns]
+    if temperature is not None:
+        delta = 25 - df['t_sample'].to_numpy()
+        isc *= 1 + temperature[0] * delta
+        voc -= temperature[1] * delta
+        pmax *= 1 - temperature[2] * delta
+    if irradiance is not None:
+        channel, one_sun, fit_pars = irradiance
+        slopes = [pars[0] if pars[0] > 0 else 0 for pars in fit_pars]
+        irrad = df[f'irrad{channel}'].to_numpy()
+        delta = one_sun - irrad
+        isc += slopes[0] * delta
+        voc += slopes[1] * (np.log(one_sun) - np.log(irrad))
+        pmax += slopes[2] * delta
+    for col, values in zip(iv_columns, [isc, voc, pmax]):
+        df[col] = values
+    return df
+
+
+def temperature_corrected(df, coefficients=temperature_coefficients):
+    return corrected(df, temperature=coefficients)
+
+
+@instrumented('iv_temperature_correction')
+def iv_temperature_correction(session, overwrite=False):
+    return run_stage(session, 'IV_Summary_T_corr', temperature_corrected, {}, overwrite)
+
+
+def irradiance_fit(df, name, channel):
+    df = df[df['name'] == name].dropna()
+    return linear_fit(df[f'irrad{channel}'].values, df[iv_columns].values.T)
+
+
+@instrumented('iv_irradiance_fit')
+def iv_irradiance_fit(session, name, channel):
+    fit = irradiance_fit(session.df, name, channel)
+    session.irrad_fit_pars = [[slope, intercept] for slope, intercept in zip(fit['slope'], fit['intercept'])]
+    return list(fit['y_pred'])
+
+
+def irradiance_corrected(df, channel, one_sun, fit_pars):
+    return corrected(df, irradiance=(channel, one_sun, fit_pars))
+
+
+@instrumented('iv_irradiance_correction')
+def iv_irradiance_correction(session, channel, one_sun, overwrite):
+    fit_pars = [[float(par) for par in pars] for pars in session.irrad_fit_pars]
+    return run_stage(session, 'IV_Summary_TI_corr', lambda df: irradiance_corrected(df, channel, one_sun, fit_pars),
+                     {'channel': channel, 'one_sun': one_sun, 'fit_pars': fit_pars}, overwrite)
+
+
+@instrumented('iv_corrections')
+def iv_corrections(session, name, channel, one_sun, overwrite=False, coefficients=temperature_coefficients):
+    # temperature and irradiance correction as one stage: the irradiance fit only needs the temperature corrected
+    # baseline rows, so the whole frame is corrected in a single pass and only the TI checkpoint is written
+    fit = irradiance_fit(temperature_corrected(session.df[session.df['name'] == name].copy(), coefficients), name,
+                         channel)
+    session.irrad_fit_pars = [[slope, intercept] for slope, intercept in zip(fit['slope'], fit['intercept'])]
+    fit_pars = [[float(par) for par in pars] for pars in session.irrad_fit_pars]
+    return run_stage(session, 'IV_Summary_TI_corr',
+                     lambda df: corrected(df, coefficients, (channel, one_sun, fit_pars)),
+                     {'temperature': list(coefficients), 'channel': channel, 'one_sun': one_sun,
+                      'fit_pars': fit_pars}, overwrite)
+
+
+@instrumented('reference_fit')
+def reference_fit(session, groups, xaxis):
+    df_fit = session.df[session.df['group'].isin(groups)].sort_values(by=xaxis)
+    keys = ['isc_eff', 'pmax_eff']
+    fit = linear_fit(df_fit[xaxis].values, df_fit[keys].values.T, 1 / df_fit[[f"d{key}" for key in keys]].values.T)
+    session.reference_fit_pars = [[slope, intercept] for slope, intercept in zip(fit['slope'], fit['intercept'])]
+    return list(fit['y_pred'])
+
+
+@instrumented('grouped_reference_fit')
+def grouped_reference_fit(session, groups, xaxis, by):
+    # one baseline per value of the column 'by' (e.g. Matrix, Solvent or QD Batch), fitted to the reference groups
+    df = session.df
+    codes, levels = pd.factorize(df[by])
+    codes = np.where(df['group'].isin(groups).values, codes, -1)
+    keys = ['isc_eff', 'pmax_eff']
+    fit = grouped_linear_fit(df[xaxis].values, df[keys].values.T, codes, len(levels),
+                             1 / df[[f"d{key}" for key in keys]].values.T)
+    fit.update({'by': by, 'levels': levels})
+    session.grouped_reference_fit = fit
+    return fit['y_pred']
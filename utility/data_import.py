@@ -0,0 +1,203 @@
+import contextlib
+import numpy as np
+import os
+import pandas as pd
+
+# Sweep files are comma separated text: a header block of 'key,value[,error]' lines (e.g. 'Time (s)' or
+# 'Short Circuit Current I_sc (A)'), then a line naming the data columns ('Voltage (V),Current (A),...'), then one
+# numeric row per sweep point. The numeric block is parsed once into a '.npy' sidecar holding one contiguous float
+# row per column, which later loads are memory-mapped from.
+
+trace_extension = '.csv'
+sidecar_extension = '.npy'
+first_column = 'Voltage (V)'
+anchor_keys = ['Short Circuit Current I_sc (A)', 'Open Circuit Voltage V_oc (V)', 'Maximum Power P_max (W)']
+
+
+def zero_crossing(column):
+    # index of the point closest to zero at the first sign change, the point closest to zero if there is none
+    signs = np.signbit(column)
+    changes = np.flatnonzero(signs[1:] != signs[:-1])
+    if not len(changes):
+        return int(np.argmin(np.abs(column)))
+    idx = int(changes[0])
+    return idx if abs(column[idx]) <= abs(column[idx + 1]) else idx + 1
+
+
+def matching_point(column, value):
+    # first point equal to a header value; the nearest one where the header is rounded differently from the sweep
+    return int(np.argmin(np.abs(column - value)))
+
+
+def find_anchors(voltage, current, power, header_values=None):
+    # the points the instrument reported in the header (Isc in the current, Voc in the voltage, Pmax in the power);
+    # traces without those header values fall back to the zero crossings and the power maximum
+    isc, voc, pmax = [np.nan] * 3 if header_values is None else header_values
+    return {'isc': matching_point(current, isc) if np.isfinite(isc) else zero_crossing(voltage),
+            'voc': matching_point(voltage, voc) if np.isfinite(voc) else zero_crossing(current),
+            'pmax': matching_point(power, pmax) if np.isfinite(pmax) else int(np.argmax(power))}
+
+
+def parse_number(text):
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+class Trace:
+
+    def __init__(self, file_path, name=None):
+        self.file_path = file_path
+        self.name = name or os.path.splitext(os.path.basename(file_path))[0]
+        self._header = None
+        self._column_names = None
+        self._skip_rows = None
+        self._values = None
+        self._columns = None
+        self._anchors = None
+
+    def _scan(self):
+        # reads only the header block, the numeric rows are left for the sidecar
+        header = list()
+        with open(self.file_path, 'r') as f:
+            for n_line, line in enumerate(f):
+                fields = [field.strip() for field in line.rstrip('\r\n').split(',')]
+                if fields[0] == first_column:
+                    self._column_names = fields
+                    self._skip_rows = n_line + 1
+                    break
+                if fields[0]:
+                    header.append(fields)
+            else:
+                raise ValueError(f"No data columns found in trace file '{self.file_path}'")
+        self._header = header
+
+    @property
+    def column_names(self):
+        if self._column_names is None:
+            self._scan()
+        return self._column_names
+
+    @property
+    def values(self):
+        # header entries as {key: [value, error]}, parsed on first use
+        if self._values is None:
+            if self._header is None:
+                self._scan()
+            self._values = {fields[0]: [parse_number(field) for field in (fields[1:] + ['nan', 'nan'])[:2]]
+                            for fields in self._header}
+        return self._values
+
+    @property
+    def sidecar_path(self):
+        return os.path.splitext(self.file_path)[0] + sidecar_extension
+
+    def _parse_columns(self):
+        names = self.column_names  # scans the header block, which sets the rows to skip
+        data = pd.read_csv(self.file_path, skiprows=self._skip_rows, header=None, names=names,
+                           dtype=float, engine='c', float_precision='round_trip').to_numpy()
+        return np.ascontiguousarray(data.T)
+
+    def _sidecar_current(self):
+        # up to date and of the right shape, checked from the .npy header so no mapping is held while it is replaced
+        sidecar = self.sidecar_path
+        if not os.path.exists(sidecar) or os.path.getmtime(sidecar) < os.path.getmtime(self.file_path):
+            return False
+        try:
+            with open(sidecar, 'rb') as f:
+                major, _ = np.lib.format.read_magic(f)
+                read_header = np.lib.format.read_array_header_1_0 if major == 1 else \
+                    np.lib.format.read_array_header_2_0
+                shape = read_header(f)[0]
+        except (OSError, ValueError):
+            return False
+        return len(shape) == 2 and shape[0] == len(self.column_names)
+
+    def _load_columns(self):
+        sidecar = self.sidecar_path
+        if not self._sidecar_current():
+            block = self._parse_columns()
+            temp_path = sidecar + '.tmp'
+            try:
+                with open(temp_path, 'wb') as f:
+                    np.save(f, block)
+                os.replace(temp_path, sidecar)
+            except OSError:  # read-only folder, or the old sidecar is still mapped elsewhere (Windows)
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+                return block
+        return np.load(sidecar, mmap_mode='r')
+
+    @property
+    def columns(self):
+        # (n_columns, n_points) float array, memory-mapped from the sidecar when it is up to date; the fit anchors
+        # are found as part of loading
+        if self._columns is None:
+            self._columns = self._load_columns()
+            self._anchors = self._find_anchors()
+        return self._columns
+
+    def release(self):
+        # drops the memory map so the sidecar can be replaced or deleted
+        self._columns = None
+
+    @property
+    def n_points(self):
+        return self.columns.shape[1]
+
+    def column(self, name):
+        return self.columns[self.column_names.index(name)]
+
+    def _find_anchors(self):
+        voltage, current = self.column('Voltage (V)'), self.column('Current (A)')
+        power = self.column('Power (W)') if 'Power (W)' in self.column_names else voltage * current
+        return find_anchors(voltage, current, power, [self.values.get(key, [np.nan])[0] for key in anchor_keys])
+
+    @property
+    def anchors(self):
+        # sweep indices of the short circuit, open circuit and maximum power points
+        if self._columns is None:
+            self.columns
+        return self._anchors
+
+    def window(self, name, start, stop):
+        # view on the points [start, stop) of one column, clipped to the sweep
+        return self.column(name)[max(start, 0):max(stop, 0)]
+
+    def anchor_window(self, name, anchor, before, after):
+        idx = self.anchors[anchor]
+        return self.window(name, idx - before, idx + after)
+
+    @property
+    def data(self):
+        return pd.DataFrame(np.asarray(self.columns).T, columns=self.column_names)
+
+
+class Experiment:
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.name = os.path.basename(os.path.normpath(folder_path))
+        file_names = sorted(f for f in os.listdir(folder_path) if f.lower().endswith(trace_extension))
+        self.traces = {trace.name: trace for trace in [Trace(os.path.join(folder_path, f)) for f in file_names]}
+        self._values = None
+
+    @property
+    def n_traces(self):
+        return len(self.traces)
+
+    @property
+    def values(self):
+        # mean and standard deviation over traces of each header value, 'Time (s)' is the first trace's start
+        if self._values is None:
+            traces = list(self.traces.values())
+            keys = [key for key in traces[0].values if all(key in trace.values for trace in traces)]
+            self._values = dict()
+            for key in keys:
+                column = np.array([trace.values[key][0] for trace in traces])
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    self._values[key] = [np.nanmean(column), np.nanstd(column, ddof=1) if len(column) > 1 else np.nan]
+            if 'Time (s)' in self._values:
+                self._values['Time (s)'] = [traces[0].values['Time (s)'][0], np.nan]
+        return self._values
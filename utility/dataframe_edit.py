@@ -1,57 +1,111 @@
+import numpy as np
 import os
 import pandas as pd
 
-from utility.config import paths
-import utility.globals as glob
-from utility.load import load_film_database
+from utility.checkpoint import backends, default_backend, find_stage, read_frame, write_frame
+from utility.film_db import film_table, join_films
+from utility.group_registry import GroupRegistry
+from utility.instrument import instrumented
+from utility.load import index_experiment_numbers
+from utility.schema import compact_frame
+from utility.stage_cache import run_stage
 
 
-def drop_experiments(indices):
-    for idx in indices:
-        mask = glob.df.index.get_level_values(0).str.endswith(str(idx).zfill(3))
-        glob.df = glob.df[~mask]
+def experiments_dropped(df, indices):
+    return df[~np.isin(index_experiment_numbers(df), np.asarray(indices, dtype=np.int64))]
 
 
-def select_experiment_range(idxmin, idxmax):
-    mask = (glob.df.index.get_level_values(0).str[-3:].astype(int) >= idxmin) & \
-           (glob.df.index.get_level_values(0).str[-3:].astype(int) <= idxmax)
-    glob.df = glob.df[mask]
+def experiments_in_range(df, idxmin, idxmax):
+    numbers = index_experiment_numbers(df)
+    return df[(numbers >= idxmin) & (numbers <= idxmax)]
 
 
-def merge_film_db(overwrite=False):
-    if os.path.exists(os.path.join(paths['last_export'], 'Processed_IV.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'Processed_IV.xlsx'), index_col=0)
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'Processed_IV.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'Processed_IV.xlsx'))
-        df_film = load_film_database()
-        glob.df = pd.merge(glob.df, df_film, left_on='film_id', right_on='Film ID', how='left')
-        glob.df.drop(columns=['Film ID', 'Film Length (mm)', 'Film width (mm)', 'Comment'], inplace=True)
+@instrumented('drop_experiments')
+def drop_experiments(session, indices):
+    session.df = experiments_dropped(session.df, indices)
+    return session
 
-        glob.df['group'] = glob.df['Matrix'].astype(str) + glob.df['Solvent'].astype(str) + \
-                           glob.df['QD Type'].astype(str) + glob.df['QD Batch'].astype(str) + \
-                           glob.df['QD Manufacturer'].astype(str) + glob.df['QD Concentration (mg/g)'].astype(str) + \
-                           glob.df['Nominal Emission (nm)'].astype(str) + glob.df['Manufactured'].astype(str)
-        glob.df['group'] = glob.df['group'].astype('category')
-        glob.df['group'] = glob.df['group'].cat.codes
 
-        glob.df.to_excel(os.path.join(paths['last_export'], 'Processed_IV.xlsx'))
+@instrumented('select_experiment_range')
+def select_experiment_range(session, idxmin, idxmax):
+    session.df = experiments_in_range(session.df, idxmin, idxmax)
+    return session
 
 
-def merge_processed_data(filepath1, filepath2, output_path):
-    df1 = pd.read_excel(filepath1, index_col=0)
-    df2 = pd.read_excel(filepath2, index_col=0)
+def film_db_merged(df, df_film, registry=None):
+    return compact_frame(join_films(df, df_film, registry))
 
-    df1['group'] = df1['group'].astype(str) + '-1'
-    df2['group'] = df2['group'].astype(str) + '-2'
 
-    df_merged = pd.concat([df1, df2]).sort_values(by='datetime')
-    df_merged['group'] = df_merged['group'].astype('category')
-    df_merged['group'] = df_merged['group'].cat.codes
-    df_merged = df_merged.reset_index(drop=True)
+@instrumented('merge_film_db')
+def merge_film_db(session, overwrite=False):
+    stat = os.stat(session.film_db)
+    registry = GroupRegistry.open(session.export_path)
+    run_stage(session, 'Processed_IV', lambda df: film_db_merged(df, film_table(session.film_db), registry),
+              {'film_db': session.film_db, 'mtime': stat.st_mtime, 'size': stat.st_size, 'registry': registry.uid},
+              overwrite)
+    registry.save()
+    return session
 
-    save_path = os.path.join(output_path, 'Processed_IV.xlsx')
-    while os.path.exists(save_path):
-        save_path = save_path[:-5] + '(1).xlsx'
 
-    df_merged.to_excel(save_path)
+def processed_files(paths):
+    # files as given, folders by their Processed_IV checkpoint
+    files = list()
+    for path in paths:
+        if os.path.isdir(path):
+            found = find_stage('Processed_IV', path)
+            if found is None:
+                raise FileNotFoundError(f"No processed data in '{path}'")
+            files.append(found)
+        else:
+            files.append(path)
+    return files
+
+
+def time_keys(df):
+    # datetime as sortable int64, NaT last like sort_values
+    keys = df['datetime'].values.astype('datetime64[ns]').view(np.int64).copy()
+    keys[pd.isna(df['datetime']).values] = np.iinfo(np.int64).max
+    return keys
+
+
+def merged_order(frames):
+    # row positions of the concatenated frames in time order; the stable sort merges the runs of inputs that are
+    # already in time order rather than sorting from scratch, and keeps input order on ties
+    keys = [time_keys(df) for df in frames]
+    return np.argsort(np.concatenate(keys), kind='stable') if keys else np.empty(0, dtype=np.int64)
+
+
+def free_path(folder, name, extension):
+    path, number = os.path.join(folder, name + extension), 0
+    while os.path.exists(path):
+        number += 1
+        path = os.path.join(folder, f'{name}({number}){extension}')
+    return path
+
+
+def merge_processed_data(paths, output_path):
+    # any number of processed files or folders; returns the path of the combined file
+    files = processed_files(paths)
+    frames = [read_frame(path) for path in files]
+    df_merged = pd.concat(frames, ignore_index=True).take(merged_order(frames)).reset_index(drop=True)
+    frames.clear()
+    # same film properties, same group in every input; ids continue the registry of the output folder
+    registry = GroupRegistry.open(output_path)
+    for path in files:
+        registry.extend(GroupRegistry.open(os.path.dirname(path)))
+    df_merged['group'] = registry.frame_ids(df_merged)
+    df_merged = compact_frame(df_merged)
+
+    # write under a temporary name and move into place, so a failed write leaves no partial file behind
+    extension = backends[default_backend()][0]
+    tmp_path = os.path.join(output_path, f'.Processed_IV.{os.getpid()}.tmp{extension}')
+    try:
+        tmp_path = write_frame(df_merged, tmp_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    save_path = free_path(output_path, 'Processed_IV', os.path.splitext(tmp_path)[1])
+    os.replace(tmp_path, save_path)
+    registry.save()
+    return save_path
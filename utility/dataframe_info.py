@@ -1,4 +1,8 @@
 import io
+import numpy as np
+import pandas as pd
+
+from utility.schema import fill_labels
 
 
 def df_info(df):
@@ -7,17 +11,67 @@ def df_info(df):
     return buf.getvalue()
 
 
+mode_columns = ['Matrix', 'QD Type', 'Nominal Emission (nm)', 'QD Concentration (mg/g)', 'Solvent', 'Additives',
+                'Additive concentration (%)']
+
+
+def grouped_mode(group_codes, n_groups, values):
+    # most frequent value per group, ties going to the smallest value like Series.mode()[0]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        try:  # tie-break on the labels themselves, not on category order
+            values = values.cat.reorder_categories(sorted(values.cat.categories))
+        except TypeError:
+            pass
+    try:
+        codes, uniques = pd.factorize(values, sort=True)
+    except TypeError:  # mixed types that cannot be ordered
+        codes, uniques = pd.factorize(values)
+    modes = np.empty(n_groups, dtype=object)
+    valid = (group_codes >= 0) & (codes >= 0)  # rows without a group key or a value count towards no mode
+    if not len(uniques) or not valid.any():
+        return modes
+    keys, counts = np.unique(group_codes[valid].astype(np.int64) * len(uniques) + codes[valid], return_counts=True)
+    key_groups, key_codes = keys // len(uniques), keys % len(uniques)
+    order = np.lexsort((key_codes, -counts, key_groups))
+    first = order[np.r_[True, key_groups[order][1:] != key_groups[order][:-1]]]
+    modes[key_groups[first]] = uniques[key_codes[first]]
+    return modes
+
+
 def pv_explore_groups(df):
+    group_codes, groups = pd.factorize(df['group'], sort=True)
+    present, first_rows = np.unique(group_codes, return_index=True)
+    first_rows = first_rows[present >= 0]
+    modes = [grouped_mode(group_codes, len(groups), fill_labels(df[col])) for col in mode_columns]
+    manufactured = df['Manufactured'].values[first_rows]
+    measured = df['datetime'].values[first_rows]
     grp_info = list()
-    groups = list(df['group'].unique())
-    groups.sort()
-    for grp_idx in groups:
-        df_grp = df[df['group'] == grp_idx]
-        entry = [None, str(grp_idx)]
-        for col in ['Matrix', 'QD Type', 'Nominal Emission (nm)', 'QD Concentration (mg/g)', 'Solvent',
-                    'Additives', 'Additive concentration (%)']:
-            entry.append(str(df_grp[col].fillna('None').mode()[0]))
-        entry.append(str(df_grp['Manufactured'].values[0]).split('T')[0])
-        entry.append(str(df_grp['datetime'].values[0]).split('T')[0])
+    for i, grp_idx in enumerate(groups):
+        entry = [None, str(grp_idx)] + [str(mode[i]) for mode in modes]
+        entry.append(str(manufactured[i]).split('T')[0])
+        entry.append(str(measured[i]).split('T')[0])
         grp_info.append(entry)
     return grp_info
+
+
+sort_axes = ['Thickness (mm)', 'Tape Layers']
+
+
+def group_index(df, axes=None):
+    # {xaxis: {group: row positions sorted by xaxis}}, None holding the rows in frame order
+    group_codes, groups = pd.factorize(df['group'], sort=True)
+    index = dict()
+    for xaxis in [None] + [col for col in (sort_axes if axes is None else axes) if col in df.columns]:
+        keys = (group_codes,) if xaxis is None else (df[xaxis].values, group_codes)
+        order = np.lexsort(keys)
+        bounds = np.searchsorted(group_codes[order], np.arange(len(groups) + 1))
+        index[xaxis] = {group: order[bounds[i]:bounds[i + 1]] for i, group in enumerate(groups)}
+    return index
+
+
+def group_rows(session, group, xaxis=None):
+    index = session.cached('group_index', group_index)
+    if xaxis in index:
+        return index[xaxis].get(group, np.empty(0, dtype=int))
+    rows = index[None].get(group, np.empty(0, dtype=int))
+    return rows[np.argsort(session.df[xaxis].values[rows], kind='stable')]
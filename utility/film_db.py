@@ -0,0 +1,44 @@
+import numpy as np
+import os
+import pandas as pd
+
+from utility.group_registry import GroupRegistry
+from utility.load import load_film_database
+from utility.schema import compact_frame
+
+# The film database is parsed once per process into a typed table indexed by Film ID and reused until the workbook
+# changes on disk. Film properties are attached to the sweeps by a hash lookup on that index.
+
+film_drop_columns = ['Film Length (mm)', 'Film width (mm)', 'Comment']
+
+_tables = dict()
+
+
+def film_table(path):
+    stat = os.stat(path)
+    signature = (stat.st_mtime, stat.st_size)
+    cached = _tables.get(path)
+    if cached is None or cached[0] != signature:
+        df = load_film_database(path).drop(columns=film_drop_columns, errors='ignore')
+        df = df.drop_duplicates(subset='Film ID', keep='first').set_index('Film ID')
+        cached = _tables[path] = (signature, compact_frame(df))
+    return cached[1]
+
+
+def clear_cache():
+    _tables.clear()
+
+
+def join_films(df, table, registry=None):
+    # left join on film_id; group ids come from the registry, looked up once per film rather than per row
+    registry = GroupRegistry() if registry is None else registry
+    keys = pd.Index(np.asarray(df['film_id'], dtype=object))
+    films = table.reindex(keys)
+    films.index = df.index
+    positions = table.index.get_indexer(keys)
+    film_ids = registry.frame_ids(table)
+    if (positions < 0).any():  # rows without a film share the all-missing tuple, picked by position -1
+        film_ids = np.append(film_ids, registry.group_id([None] * len(registry.columns)))
+    df = pd.concat([df, films], axis=1)
+    df['group'] = film_ids[positions] if len(positions) else np.empty(0, dtype=np.int64)
+    return df.reset_index(drop=True)
@@ -0,0 +1,154 @@
+import numpy as np
+
+signal_columns = {'T': 'Temperature (C)',
+                  'Irrad1': 'Irradiance 1 (W/m2)',
+                  'Irrad2': 'Irradiance 2 (W/m2)',
+                  'Irrad3': 'Irradiance 3 (W/m2)',
+                  'Irrad4': 'Irradiance 4 (W/m2)'}
+
+
+def window_labels(suffix):
+    return [f'{prefix}{label}{suffix}' for label in signal_columns for prefix in ['', 'd']]
+
+
+fit_labels = ['Isc_fit', 'dIsc_fit'] + window_labels('_Isc') + ['Voc_fit', 'dVoc_fit'] + window_labels('_Voc') + \
+             ['Pmax_fit'] + window_labels('_Pmax') + ['FF_fit']
+
+
+def stack_windows(windows):
+    # pads one slice per trace into a NaN padded (n_traces, n_points) block
+    block = np.full((len(windows), max([len(window) for window in windows] + [1])), np.nan)
+    for i, window in enumerate(windows):
+        block[i, :len(window)] = window
+    return block
+
+
+def polyfit(x, y, degree):
+    # closed form least squares y = c0 + c1 * x + ... for every row of the NaN padded blocks x and y
+    mask = ~(np.isnan(x) | np.isnan(y))
+    y = np.where(mask, y, 0.)
+    design = np.stack([np.where(mask, x, 0.) ** k for k in range(degree + 1)], axis=-1) * mask[..., None]
+    ata = np.einsum('nmi,nmj->nij', design, design)
+    aty = np.einsum('nmi,nm->ni', design, y)
+    solvable = (mask.sum(axis=1) > degree + 1) & (np.linalg.matrix_rank(ata) == degree + 1)
+    ata[~solvable] = np.eye(degree + 1)
+    coefs = np.linalg.solve(ata, aty[..., None])[..., 0]
+    residuals = (y - np.einsum('nmi,ni->nm', design, coefs)) * mask
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (residuals ** 2).sum(axis=1) / (mask.sum(axis=1) - degree - 1)
+    errors = np.sqrt(np.diagonal(np.linalg.inv(ata), axis1=1, axis2=2) * variance[:, None])
+    coefs[~solvable] = np.nan
+    errors[~solvable] = np.nan
+    return coefs, errors
+
+
+def shockley(v, iph, i0, vt):
+    return iph - i0 * np.exp(v / vt)
+
+
+def fit_shockley(v, i, p0, n_iter=1000, xtol=1.5e-8):
+    # Levenberg-Marquardt on i = iph - exp(b + (v - vc) / vt), run for all rows of the NaN padded blocks at once.
+    # b = log(i0) + vc / vt with vc the window's mean voltage: fitted this way i0 and vt are nearly uncorrelated and
+    # the problem is well scaled. Rows that do not converge are NaN
+    mask = ~(np.isnan(v) | np.isnan(i))
+    with np.errstate(invalid='ignore'):
+        vc = np.nanmean(np.where(mask, v, np.nan), axis=1, keepdims=True)
+    v = np.where(mask, v - vc, 0.)
+    i = np.where(mask, i, 0.)
+    pars = np.array(p0, dtype=float)
+    pars[:, 1] = np.log(pars[:, 1]) + vc[:, 0] / pars[:, 2]
+    damping = np.full(len(pars), 1e-3)
+    active = mask.sum(axis=1) > 3
+    converged = np.zeros(len(pars), dtype=bool)
+
+    def rss(p):
+        with np.errstate(over='ignore', invalid='ignore'):
+            r = (i - p[:, :1] + np.exp(p[:, 1:2] + v / p[:, 2:])) * mask
+        return (r ** 2).sum(axis=1), r
+
+    cost, res = rss(pars)
+    for _ in range(n_iter):
+        if not active.any():
+            break
+        with np.errstate(over='ignore', invalid='ignore'):
+            expo = np.exp(pars[:, 1:2] + v / pars[:, 2:])
+            jac = np.stack([np.ones_like(v), -expo, expo * v / pars[:, 2:] ** 2], axis=-1)
+        jac *= mask[..., None]
+        jtj = np.einsum('nmi,nmj->nij', jac, jac)
+        jtr = np.einsum('nmi,nm->ni', jac, res)
+        scale = np.maximum(np.diagonal(jtj, axis1=1, axis2=2), 1e-30)
+        lhs = jtj + damping[:, None, None] * scale[:, :, None] * np.eye(3)
+        lhs[~active] = np.eye(3)
+        with np.errstate(over='ignore', invalid='ignore'):
+            step = np.linalg.solve(lhs, jtr[..., None])[..., 0]
+        trial = pars + step
+        new_cost, new_res = rss(trial)
+        accept = active & np.isfinite(new_cost) & (new_cost <= cost) & (trial[:, 2] > 0)
+        # MINPACK's parameter test: the accepted step is small next to the parameters
+        small = accept & np.all(np.abs(step) <= xtol * (np.abs(pars) + xtol), axis=1)
+        pars[accept] = trial[accept]
+        res[accept] = new_res[accept]
+        cost[accept] = new_cost[accept]
+        damping = np.where(accept, damping / 3, damping * 2)
+        converged |= small
+        active &= ~small & (damping < 1e12)
+    pars[~converged] = np.nan
+    pars[:, 1] = np.exp(pars[:, 1] - vc[:, 0] / pars[:, 2])
+    return pars
+
+
+def shockley_pmax(pars, v0, n_iter=50):
+    # Newton iteration on dP/dv = iph - i0 * exp(v / vt) * (1 + v / vt) = 0, started at the measured Vmp
+    iph, i0, vt = pars.T
+    v = np.array(v0, dtype=float)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(n_iter):
+            expo = np.exp(v / vt)
+            v = v - (iph - i0 * expo * (1 + v / vt)) / (-i0 * expo * (2 + v / vt) / vt)
+        return v * shockley(v, iph, i0, vt)
+
+
+def window_stats(blocks, suffix):
+    stats = dict()
+    for label, block in blocks.items():
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats[f'{label}{suffix}'] = np.nanmean(block, axis=1)
+            stats[f'd{label}{suffix}'] = np.nanstd(block, axis=1, ddof=1)
+    return stats
+
+
+def fit_traces(traces, n_isc=3, n_voc=5, n_pmax=10, i00=4e-5, vt0=7.5e-2):
+    traces = list(traces)
+
+    # windows are views on the memory-mapped columns around the anchors found when each trace was loaded
+    def isc_windows(column):
+        return stack_windows([trace.window(column, 0, trace.anchors['isc'] + n_isc) for trace in traces])
+
+    def anchor_windows(column, anchor, n):
+        return stack_windows([trace.anchor_window(column, anchor, n, n) for trace in traces])
+
+    results = dict()
+
+    # Isc: straight line through the sweep start, evaluated at V = 0
+    coefs, errors = polyfit(isc_windows('Voltage (V)'), isc_windows('Current (A)'), 1)
+    results['Isc_fit'], results['dIsc_fit'] = coefs[:, 0], errors[:, 0]
+    results.update(window_stats({label: isc_windows(column) for label, column in signal_columns.items()}, '_Isc'))
+
+    # Voc: parabola V(I) around the open circuit point, evaluated at I = 0
+    coefs, errors = polyfit(anchor_windows('Current (A)', 'voc', n_voc), anchor_windows('Voltage (V)', 'voc', n_voc), 2)
+    results['Voc_fit'], results['dVoc_fit'] = coefs[:, 0], errors[:, 0]
+    results.update(window_stats({label: anchor_windows(column, 'voc', n_voc)
+                                 for label, column in signal_columns.items()}, '_Voc'))
+
+    # Pmax: Shockley diode fit around the maximum power point
+    p0 = np.column_stack([[trace.values['Short Circuit Current I_sc (A)'][0] for trace in traces],
+                          np.full(len(traces), i00), np.full(len(traces), vt0)])
+    pars = fit_shockley(anchor_windows('Voltage (V)', 'pmax', n_pmax), anchor_windows('Current (A)', 'pmax', n_pmax),
+                        p0)
+    v_mp = np.array([trace.column('Voltage (V)')[trace.anchors['pmax']] for trace in traces])
+    results['Pmax_fit'] = shockley_pmax(pars, v_mp)
+    results.update(window_stats({label: anchor_windows(column, 'pmax', n_pmax)
+                                 for label, column in signal_columns.items()}, '_Pmax'))
+
+    results['FF_fit'] = results['Pmax_fit'] / (results['Isc_fit'] * results['Voc_fit'])
+    return results
@@ -1,4 +0,0 @@
-import pandas as pd
-
-df = pd.DataFrame()
-irrad_fit_pars = [[0, 0], [0, 0], [0, 0]]
@@ -0,0 +1,83 @@
+import json
+import numpy as np
+import os
+import pandas as pd
+import uuid
+
+# Groups are the distinct film property tuples. The registry hands each tuple an id the first time it is seen and
+# keeps it in the export folder, so group ids stay the same across runs, appends and merges.
+
+registry_name = 'group_registry.json'
+group_columns = ['Matrix', 'Solvent', 'QD Type', 'QD Batch', 'QD Manufacturer', 'QD Concentration (mg/g)',
+                 'Nominal Emission (nm)', 'Manufactured']
+
+
+def normalized(value):
+    # JSON safe and stable under Excel and parquet round trips (620 vs 620.0, Timestamp vs datetime64)
+    if value is None or value is pd.NaT or (np.ndim(value) == 0 and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, float, np.number)):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    return str(value)
+
+
+class GroupRegistry:
+
+    def __init__(self, path=None, columns=None):
+        self.path = path
+        self.columns = list(group_columns if columns is None else columns)
+        self.uid = uuid.uuid4().hex
+        self.groups = dict()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+            self.columns, self.uid, self.groups = stored['columns'], stored['uid'], stored['groups']
+
+    @classmethod
+    def open(cls, folder):
+        return cls(os.path.join(folder, registry_name))
+
+    def __len__(self):
+        return len(self.groups)
+
+    def group_id(self, values):
+        key = json.dumps([normalized(value) for value in values])
+        if key not in self.groups:
+            self.groups[key] = max(self.groups.values(), default=-1) + 1
+        return self.groups[key]
+
+    def extend(self, other):
+        # takes over the groups of another registry, keeping their ids where they are still free
+        used = set(self.groups.values())
+        for key in sorted(other.groups, key=other.groups.get):
+            if key in self.groups:
+                continue
+            group = other.groups[key] if other.groups[key] not in used else max(used) + 1
+            self.groups[key] = group
+            used.add(group)
+        return self
+
+    def frame_ids(self, df):
+        # one lookup per distinct tuple, not per row
+        codes = df.groupby(self.columns, dropna=False, observed=True, sort=False).ngroup().values
+        first = np.unique(codes, return_index=True)[1]
+        ids = np.array([self.group_id(values) for values in df[self.columns].iloc[first].itertuples(index=False)],
+                       dtype=np.int64)
+        return ids[codes] if len(ids) else np.empty(0, dtype=np.int64)
+
+    def table(self):
+        rows = [[group] + json.loads(key) for key, group in self.groups.items()]
+        return pd.DataFrame(rows, columns=['group'] + self.columns).set_index('group').sort_index()
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'columns': self.columns, 'uid': self.uid, 'groups': self.groups}, f, indent=1)
+        os.replace(path + '.tmp', path)
+        return path
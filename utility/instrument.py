@@ -0,0 +1,63 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True).sum()) if df is not None else 0
+
+
+def instrumented(stage):
+    # records wall time, rows and frame memory before and after for functions taking the session as first argument;
+    # with session.profile set the call also runs under cProfile and its stats go next to the run report
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(session, *args, **kwargs):
+            rows_in, memory_in = len(session.df.index), frame_bytes(session.df)
+            profiler = cProfile.Profile() if session.profile else None
+            start = time.perf_counter()
+            if profiler:
+                profiler.enable()
+            try:
+                return fn(session, *args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                memory_out = frame_bytes(session.df)
+                record = {'stage': stage, 'started': time.time() - seconds, 'seconds': seconds, 'rows_in': rows_in,
+                          'rows_out': len(session.df.index), 'memory_in': memory_in, 'memory_out': memory_out,
+                          'memory_delta': memory_out - memory_in}
+                if profiler:
+                    profiler.disable()
+                    record['profile'] = save_profile(profiler, session.export_path, stage, len(session.report))
+                session.report.append(record)
+        return wrapper
+    return decorator
+
+
+def save_profile(profiler, folder, stage, number):
+    path = os.path.join(folder, 'profiles', f'{number:03d}_{stage}.prof')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    profiler.dump_stats(path)
+    return path
+
+
+def profile_summary(path, n_lines=15):
+    buf = io.StringIO()
+    pstats.Stats(path, stream=buf).sort_stats('cumulative').print_stats(n_lines)
+    return buf.getvalue()
+
+
+def format_record(record):
+    return f"{record['stage']}: {record['seconds']:.3f} s, {record['rows_in']} -> {record['rows_out']} rows, " \
+           f"{record['memory_delta'] / 2 ** 20:+.1f} MiB ({record['memory_out'] / 2 ** 20:.1f} MiB)"
+
+
+def write_report(session, path=None):
+    path = path or os.path.join(session.export_path, 'run_report.json')
+    with open(path, 'w') as f:
+        json.dump({'export_path': session.export_path, 'stages': session.report}, f, indent=1)
+    return path
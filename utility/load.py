@@ -1,37 +1,157 @@
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import json
+import numpy as np
 import os
 import pandas as pd
 
-from utility.config import paths
-import utility.globals as glob
-
-
-def load_experiments(path, overwrite=True):
-    if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'IV_Summary.xlsx'), index_col=[0, 1])
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'IV_Summary.xlsx'))
-        df_list = []
-        df_keys = []
-        for subdir, dirs, files in os.walk(path):
-            for filename in files:
-                if filename == 'IV_Summary.xlsx':
-                    filepath = subdir + os.sep + filename
-                    df_list.append(pd.read_excel(filepath))
-                    df_keys.append(os.path.basename(subdir).split(' ')[0])
-        glob.df = pd.concat(df_list, keys=df_keys)
-        df_list.clear()
-        glob.df.drop(columns=['Unnamed: 0', 'count', 'cycle', 'cell_id', 'location', 'cal_date', 'cal_value', 'pid_pb',
-                     'pid_int', 'pid_der', 'pid_fuoc', 'pid_tcr1', 'pid_tcr2', 'pid_sp'],
-                     inplace=True)
-        glob.df['datetime'] = [datetime.fromtimestamp(ts) for ts in glob.df['timestamp'].values]
-        glob.df.to_excel(os.path.join(paths['last_export'], 'IV_Summary.xlsx'))
-
-
-def load_film_database():
-    return pd.read_excel(paths['film_db'])
-
-
-def load_global_df(path):
-    glob.df = pd.read_excel(path, index_col=0)
+from utility.checkpoint import load_stage, read_frame, save_stage, stage_exists
+from utility.conversions import epoch_to_datetime
+from utility.instrument import instrumented
+from utility.schema import compact_frame, memory_report
+from utility.session import Session
+
+manifest_name = 'IV_Summary_manifest.json'
+drop_columns = ['Unnamed: 0', 'count', 'cycle', 'cell_id', 'location', 'cal_date', 'cal_value', 'pid_pb', 'pid_int',
+                'pid_der', 'pid_fuoc', 'pid_tcr1', 'pid_tcr2', 'pid_sp']
+
+
+def find_summaries(path, exclude=None):
+    summaries = list()
+    for subdir, dirs, files in os.walk(path):
+        if 'IV_Summary.xlsx' in files:
+            filepath = subdir + os.sep + 'IV_Summary.xlsx'
+            if exclude and os.path.normcase(os.path.abspath(filepath)) == os.path.normcase(os.path.abspath(exclude)):
+                continue
+            stat = os.stat(filepath)
+            summaries.append({'path': filepath, 'key': os.path.basename(subdir).split(' ')[0],
+                              'mtime': stat.st_mtime, 'size': stat.st_size})
+    return summaries
+
+
+def read_summary(filepath):
+    return pd.read_excel(filepath).drop(columns=drop_columns)
+
+
+def read_summaries(filepaths, workers=None, progress=None):
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(filepaths) < 2:
+        return collect(map(read_summary, filepaths), len(filepaths), progress)
+    chunksize = max(1, len(filepaths) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=min(workers, len(filepaths))) as executor:
+        return collect(executor.map(read_summary, filepaths, chunksize=chunksize), len(filepaths), progress)
+
+
+def collect(results, total, progress=None):
+    df_list = list()
+    for df in results:
+        df_list.append(df)
+        if progress:
+            progress(len(df_list), total)
+    return df_list
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def manifest_entries(summaries):
+    return {entry['path']: [entry['key'], entry['mtime'], entry['size']] for entry in summaries}
+
+
+def write_manifest(path, import_path, summaries, timezone=None, files=None):
+    # files: entries to keep from an earlier manifest, e.g. experiments processed before an append
+    manifest = {'import_path': import_path, 'timezone': timezone,
+                'files': {**(files or {}), **manifest_entries(summaries)}}
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+
+def unchanged_keys(summaries, manifest, import_path, timezone=None):
+    if manifest.get('import_path') != import_path or manifest.get('timezone') != timezone:
+        return set()
+    keys = [entry['key'] for entry in summaries]
+    duplicates = {key for key in keys if keys.count(key) > 1}
+    unchanged = set()
+    for entry in summaries:
+        if manifest['files'].get(entry['path']) == [entry['key'], entry['mtime'], entry['size']] and \
+                entry['key'] not in duplicates:
+            unchanged.add(entry['key'])
+    return unchanged
+
+
+def experiment_numbers(keys):
+    # last three digits of the folder keys (as the old key[-3:] slice), parsed once per experiment rather than per
+    # row; -1 where there are none
+    keys = np.asarray(keys, dtype=str)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    numbers = pd.Series(unique).str.extract(r'(\d{1,3})$', expand=False).fillna(-1).astype(np.int64).values
+    return numbers[inverse.ravel()]
+
+
+def with_experiment_numbers(index):
+    # (folder key, row) -> (folder key, exp_no, row); frames saved before the exp_no level existed get it here
+    if 'exp_no' in index.names:
+        return index
+    keys = index.get_level_values(0)
+    return pd.MultiIndex.from_arrays([keys, experiment_numbers(keys), index.get_level_values(-1)],
+                                     names=[index.names[0], 'exp_no', index.names[-1]])
+
+
+def index_experiment_numbers(df):
+    return with_experiment_numbers(df.index).get_level_values('exp_no').values
+
+
+def in_walk_order(df, summaries):
+    # restores the folder walk order so cached and freshly parsed experiments interleave as in a full import
+    order = {entry['key']: i for i, entry in enumerate(summaries)}
+    positions = df.index.get_level_values(0).map(order).to_numpy(dtype=float, na_value=len(order))
+    return df.iloc[np.argsort(positions, kind='stable')]
+
+
+def summaries_frame(summaries, timezone=None, workers=None, progress=None):
+    df = pd.concat(read_summaries([entry['path'] for entry in summaries], workers, progress),
+                   keys=[entry['key'] for entry in summaries])
+    df.index = with_experiment_numbers(df.index)
+    df['datetime'] = epoch_to_datetime(df['timestamp'].values, timezone)
+    return df
+
+
+@instrumented('load_experiments')
+def load_experiments(session, path, overwrite=True, workers=None, progress=None):
+    folder = session.export_path
+    manifest_path = os.path.join(folder, manifest_name)
+    if stage_exists('IV_Summary', folder) and not overwrite:
+        df = load_stage('IV_Summary', folder)
+        df.index = with_experiment_numbers(df.index)
+        session.df = df
+        return session
+    summaries = find_summaries(path, exclude=os.path.join(folder, 'IV_Summary.xlsx'))
+    reuse = unchanged_keys(summaries, read_manifest(manifest_path), path, session.timezone) \
+        if stage_exists('IV_Summary', folder) else set()
+    df_list = list()
+    if reuse:
+        df_cached = load_stage('IV_Summary', folder)
+        df_cached.index = with_experiment_numbers(df_cached.index)
+        df_list.append(df_cached[df_cached.index.get_level_values(0).isin(reuse)])
+    to_parse = [entry for entry in summaries if entry['key'] not in reuse]
+    if to_parse:
+        df_list.append(summaries_frame(to_parse, session.timezone, workers, progress))
+    df = pd.concat(df_list)
+    df_list.clear()
+    df = in_walk_order(df, summaries)
+    session.df = compact_frame(df)
+    session.memory_report = memory_report(df, session.df)
+    save_stage(session.df, 'IV_Summary', folder)
+    write_manifest(manifest_path, path, summaries, session.timezone)
+    return session
+
+
+def load_film_database(path):
+    return pd.read_excel(path)
+
+
+def load_session(path):
+    return Session(read_frame(path))
@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+from configparser import ConfigParser
+import os
+import sys
+
+from utility.append import append_experiments, read_record, write_record
+from utility.corrections import iv_corrections, iv_temperature_correction, iv_irradiance_fit, \
+    iv_irradiance_correction
+from utility.dataframe_edit import drop_experiments, select_experiment_range, merge_film_db
+from utility.film_db import clear_cache as clear_film_tables
+from utility.instrument import write_report
+from utility.load import load_experiments
+from utility.process import average_by_experiment, average_by, calc_efficiency
+from utility.session import Session
+
+# The batch runner must stay importable on headless nodes: no PyQt, matplotlib or seaborn imports here.
+
+example_job = """[paths]
+import = /data/solar_simulator/2020-08
+export = /data/solar_simulator/2020-08/processed
+film_db = /data/film_database.xlsx
+
+[load]
+overwrite = yes
+drop = 3, 17
+range = 1, 999
+timezone = Europe/London
+
+[temperature]
+
+[irradiance]
+baseline = PV masked
+channel = 2
+one_sun = 515
+
+[average]
+by = name
+
+[efficiency]
+reference = PV masked
+
+[film_db]
+"""
+
+
+def read_job(job_path):
+    job = ConfigParser(interpolation=None)
+    if not job.read(job_path):
+        raise FileNotFoundError(f"Job file '{job_path}' not found")
+    if not job.has_option('paths', 'import'):
+        raise ValueError(f"Job file '{job_path}' does not specify an import folder")
+    return job
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(',') if value.strip()]
+
+
+def job_session(job, profile=False, timezone=None):
+    clear_film_tables()
+    import_path = job['paths']['import']
+    session = Session(export_path=job['paths'].get('export', import_path), film_db=job['paths'].get('film_db'),
+                      profile=profile, timezone=timezone or job.get('load', 'timezone', fallback=None))
+    os.makedirs(session.export_path, exist_ok=True)
+    return session
+
+
+def run_job(job_path, load_workers=None, profile=False):
+    job = read_job(job_path)
+    import_path = job['paths']['import']
+    session = job_session(job, profile)
+    # everything an append run needs to treat new experiments the same way
+    record = {'import_path': import_path, 'timezone': session.timezone, 'drop': [], 'range': [],
+              'temperature': job.has_section('temperature'), 'irradiance': None, 'average': None,
+              'efficiency': None, 'film_db': job.has_section('film_db')}
+
+    load_experiments(session, import_path, job.getboolean('load', 'overwrite', fallback=True), load_workers)
+    if job.get('load', 'drop', fallback=''):
+        record['drop'] = parse_ints(job['load']['drop'])
+        drop_experiments(session, record['drop'])
+    if job.get('load', 'range', fallback=''):
+        record['range'] = parse_ints(job['load']['range'])
+        select_experiment_range(session, *record['range'])
+    if job.has_section('temperature') and job.has_section('irradiance'):
+        section = job['irradiance']
+        iv_corrections(session, section['baseline'], section.get('channel', '2'), section.getfloat('one_sun', 515.),
+                       section.getboolean('overwrite', False) or
+                       job.getboolean('temperature', 'overwrite', fallback=False))
+    elif job.has_section('temperature'):
+        iv_temperature_correction(session, job.getboolean('temperature', 'overwrite', fallback=False))
+    elif job.has_section('irradiance'):
+        section = job['irradiance']
+        iv_irradiance_fit(session, section['baseline'], section.get('channel', '2'))
+        iv_irradiance_correction(session, section.get('channel', '2'), section.getfloat('one_sun', 515.),
+                                 section.getboolean('overwrite', False))
+    if job.has_section('irradiance'):
+        section = job['irradiance']
+        record['irradiance'] = {'channel': section.get('channel', '2'), 'one_sun': section.getfloat('one_sun', 515.),
+                                'fit_pars': [[float(par) for par in pars] for pars in session.irrad_fit_pars]}
+    if job.has_section('average'):
+        average_by_experiment(session, job.getboolean('average', 'overwrite', fallback=False))
+        if job.get('average', 'by', fallback=''):
+            average_by(session, job['average']['by'], job.getboolean('average', 'overwrite', fallback=False))
+        record['average'] = {'by': job.get('average', 'by', fallback='')}
+    if job.has_section('efficiency'):
+        calc_efficiency(session, job['efficiency']['reference'],
+                        job.getboolean('efficiency', 'overwrite', fallback=False))
+        record['efficiency'] = {'reference': job['efficiency']['reference'], 'values': session.efficiency_reference}
+    if job.has_section('film_db'):
+        merge_film_db(session, job.getboolean('film_db', 'overwrite', fallback=False))
+    write_record(session.export_path, record)
+    write_report(session)
+    return job_path, len(session.df.index)
+
+
+def append_job(job_path, load_workers=None, profile=False):
+    # processes only experiment folders added since the last run, with that run's parameters; the first run of a
+    # job has nothing to append to and runs in full
+    job = read_job(job_path)
+    session = job_session(job, profile)
+    record = read_record(session.export_path)
+    if record is None:
+        return run_job(job_path, load_workers, profile)
+    session.timezone = record['timezone']
+    append_experiments(session, job['paths']['import'], record, load_workers)
+    write_report(session)
+    return job_path, len(session.df.index)
+
+
+def run_jobs(job_paths, workers=None, profile=False, append=False):
+    run = append_job if append else run_job
+    if len(job_paths) == 1:
+        return [run(job_paths[0], profile=profile)]
+    # jobs already run in parallel, so each one parses its experiment folders on a single core; every job gets a
+    # fresh worker process so no module state carries over between jobs (job_session resets it on older Pythons)
+    fresh = {'max_tasks_per_child': 1} if sys.version_info >= (3, 11) else {}
+    with ProcessPoolExecutor(max_workers=workers, **fresh) as executor:
+        return list(executor.map(run, job_paths, [1] * len(job_paths), [profile] * len(job_paths)))
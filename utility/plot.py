@@ -1,22 +1,29 @@
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import os
-import seaborn as sns
 
 from utility.colors import color_wheel
-from utility.config import paths
-import utility.globals as glob
 
-sns.set()
+styled = False
 
 
-def plot_ty(name, yaxis_name):
-    mask = glob.df['name'] == name
+def set_style():
+    # seaborn is only needed for its theme, so it is imported and applied when the first plotting window opens
+    global styled
+    if not styled:
+        import seaborn as sns
+        sns.set()
+        styled = True
+
+
+def plot_ty(df, name, yaxis_name, folder):
+    set_style()
+    df = df[df['name'] == name]
     fig, ax = plt.subplots(figsize=(8, 5))
-    ax.plot(glob.df[mask]['datetime'], glob.df[mask][yaxis_name], color=color_wheel[1], lw=2)
+    ax.plot(df['datetime'], df[yaxis_name], color=color_wheel[1], lw=2)
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
     ax.set_xlabel('Time (hs)')
     ax.set_ylabel(yaxis_name)
     fig.tight_layout(pad=0.3)
-    fig.savefig(os.path.join(paths['last_export'], f'{name}_time_vs_{yaxis_name}.png'))
+    fig.savefig(os.path.join(folder, f'{name}_time_vs_{yaxis_name}.png'))
     plt.clf()
@@ -1,71 +1,106 @@
-import os
+import numpy as np
 import pandas as pd
 
-from utility.config import paths
-import utility.globals as glob
-
-
-def average_by_experiment(overwrite=False):
-    if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_Average.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'IV_Summary_Average.xlsx'), index_col=0)
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_Average.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'IV_Summary_Average.xlsx'))
-        glob.df = glob.df.groupby(level=0).agg({'timestamp': 'first', 'isc_fit': ['mean', 'std'],
-                                                'voc_fit': ['mean', 'std'], 'pmax_fit': ['mean', 'std'],
-                                                'name': 'first', 'film_id': 'first', 't_room': 'first',
-                                                'rh_room': 'first', 'datetime': 'first'})
-        glob.df.columns = ['timestamp', 'isc', 'disc', 'voc', 'dvoc', 'pmax', 'dpmax', 'name', 'film_id',
-                           't_room', 'rh_room', 'datetime']
-        glob.df.to_excel(os.path.join(paths['last_export'], 'IV_Summary_Average.xlsx'))
-
-
-def average_by(col_name, overwrite=False):
-    if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_Average_by_Film.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'IV_Summary_Average_by_Film.xlsx'), index_col=0)
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_Average_by_Film.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'IV_Summary_Average_by_Film.xlsx'))
-        mask_unique = glob.df[col_name].isin(glob.df[col_name].value_counts()[glob.df[col_name].
-                                             value_counts() == 1].index)
-        df_unique = glob.df[mask_unique]
-        df_to_average = glob.df[~mask_unique]
-        df_to_average = df_to_average.groupby(col_name).agg({'timestamp': 'first', 'isc': ['mean', 'std'],
-                                                             'voc': ['mean', 'std'], 'pmax': ['mean', 'std'],
-                                                             'name': 'first', 'film_id': 'first', 't_room': 'mean',
-                                                             'rh_room': 'mean', 'datetime': 'first'})
-        df_to_average.columns = ['timestamp', 'isc', 'disc', 'voc', 'dvoc', 'pmax', 'dpmax', 'name', 'film_id',
-                                 't_room', 'rh_room', 'datetime']
-        glob.df = pd.concat([df_unique, df_to_average]).sort_values(by='datetime')
-        glob.df = glob.df.reset_index(drop=True)
-        glob.df.to_excel(os.path.join(paths['last_export'], 'IV_Summary_Average_by_Film.xlsx'))
-
-
-def calc_efficiency(name, overwrite=False):
-    if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_Efficiency.xlsx')) and not overwrite:
-        glob.df = pd.read_excel(os.path.join(paths['last_export'], 'IV_Summary_Efficiency.xlsx'), index_col=0)
-    else:
-        if os.path.exists(os.path.join(paths['last_export'], 'IV_Summary_Efficiency.xlsx')):
-            os.remove(os.path.join(paths['last_export'], 'IV_Summary_Efficiency.xlsx'))
-        dut_pmax, dut_dpmax = glob.df[glob.df['name'] == name][['pmax', 'dpmax']].values[0]
-        upper = ((glob.df['pmax'] + glob.df['dpmax']) / (dut_pmax - dut_dpmax) - 1) * 100
-        lower = ((glob.df['pmax'] - glob.df['dpmax']) / (dut_pmax + dut_dpmax) - 1) * 100
-        glob.df['pmax_eff'] = (upper + lower) / 2
-        glob.df['dpmax_eff'] = (upper - lower) / 2
-        dut_isc, dut_disc = glob.df[glob.df['name'] == name][['isc', 'disc']].values[0]
-        upper = ((glob.df['isc'] + glob.df['disc']) / (dut_isc - dut_disc) - 1) * 100
-        lower = ((glob.df['isc'] - glob.df['disc']) / (dut_isc + dut_disc) - 1) * 100
-        glob.df['isc_eff'] = (upper + lower) / 2
-        glob.df['disc_eff'] = (upper - lower) / 2
-        glob.df.to_excel(os.path.join(paths['last_export'], 'IV_Summary_Efficiency.xlsx'))
-
-
-def pce_vs_reference(groups, xaxis):
-    for group_id in groups:
-        mask_group = glob.df['group'] == group_id
-        for i, key in enumerate(['isc_eff', 'pmax_eff']):
-            glob.df.loc[mask_group, [f"{key[:-3]}impr"]] = glob.df[mask_group][key] - \
-                                            (glob.irrad_fit_pars[i][0] * glob.df[mask_group][xaxis] +
-                                             glob.irrad_fit_pars[i][1])
-            glob.df.loc[mask_group, [f"d{key[:-3]}impr"]] = glob.df[mask_group][f"d{key}"]
-    glob.df.to_excel(paths['pv_improve_file'])
+from utility.checkpoint import write_frame
+from utility.dataframe_info import group_rows
+from utility.instrument import instrumented
+from utility.stage_cache import run_stage
+
+
+def experiment_averages(df):
+    df = df.groupby(level=0, observed=True).agg({'timestamp': 'first', 'isc_fit': ['mean', 'std'],
+                                                 'voc_fit': ['mean', 'std'], 'pmax_fit': ['mean', 'std'],
+                                                 'name': 'first', 'film_id': 'first', 't_room': 'first',
+                                                 'rh_room': 'first', 'datetime': 'first'})
+    df.columns = ['timestamp', 'isc', 'disc', 'voc', 'dvoc', 'pmax', 'dpmax', 'name', 'film_id',
+                  't_room', 'rh_room', 'datetime']
+    return df
+
+
+@instrumented('average_by_experiment')
+def average_by_experiment(session, overwrite=False):
+    return run_stage(session, 'IV_Summary_Average', experiment_averages, {}, overwrite)
+
+
+def averages_by(df, col_name):
+    mask_unique = df[col_name].isin(df[col_name].value_counts()[df[col_name].value_counts() == 1].index)
+    df_unique = df[mask_unique]
+    df_to_average = df[~mask_unique]
+    df_to_average = df_to_average.groupby(col_name, observed=True).agg({'timestamp': 'first',
+                                                                        'isc': ['mean', 'std'],
+                                                                        'voc': ['mean', 'std'],
+                                                                        'pmax': ['mean', 'std'],
+                                                                        'name': 'first', 'film_id': 'first',
+                                                                        't_room': 'mean', 'rh_room': 'mean',
+                                                                        'datetime': 'first'})
+    df_to_average.columns = ['timestamp', 'isc', 'disc', 'voc', 'dvoc', 'pmax', 'dpmax', 'name', 'film_id',
+                             't_room', 'rh_room', 'datetime']
+    df = pd.concat([df_unique, df_to_average]).sort_values(by='datetime')
+    return df.reset_index(drop=True)
+
+
+@instrumented('average_by')
+def average_by(session, col_name, overwrite=False):
+    return run_stage(session, 'IV_Summary_Average_by_Film', lambda df: averages_by(df, col_name),
+                     {'col_name': col_name}, overwrite)
+
+
+def reference_values(df, name):
+    # pmax, dpmax, isc, disc of the first row measured on the reference device
+    return [float(value) for value in df[df['name'] == name][['pmax', 'dpmax', 'isc', 'disc']].values[0]]
+
+
+def efficiencies(df, name, reference=None):
+    dut_pmax, dut_dpmax, dut_isc, dut_disc = reference_values(df, name) if reference is None else reference
+    upper = ((df['pmax'] + df['dpmax']) / (dut_pmax - dut_dpmax) - 1) * 100
+    lower = ((df['pmax'] - df['dpmax']) / (dut_pmax + dut_dpmax) - 1) * 100
+    df['pmax_eff'] = (upper + lower) / 2
+    df['dpmax_eff'] = (upper - lower) / 2
+    upper = ((df['isc'] + df['disc']) / (dut_isc - dut_disc) - 1) * 100
+    lower = ((df['isc'] - df['disc']) / (dut_isc + dut_disc) - 1) * 100
+    df['isc_eff'] = (upper + lower) / 2
+    df['disc_eff'] = (upper - lower) / 2
+    return df
+
+
+@instrumented('calc_efficiency')
+def calc_efficiency(session, name, overwrite=False):
+    session.efficiency_reference = reference_values(session.df, name)
+    return run_stage(session, 'IV_Summary_Efficiency', lambda df: efficiencies(df, name), {'name': name}, overwrite)
+
+
+def column_or_nan(df, col):
+    return df[col].to_numpy(dtype=float, copy=True) if col in df else np.full(len(df.index), np.nan)
+
+
+def reference_lines(session, df, rows, by=None):
+    # slopes and intercepts (2, n_rows) of the baseline each row is compared against
+    if by is None:
+        pars = np.array(session.reference_fit_pars, dtype=float)
+        return pars[:, :1].repeat(len(rows), axis=1), pars[:, 1:].repeat(len(rows), axis=1)
+    fit = session.grouped_reference_fit
+    if fit is None or fit['by'] != by:
+        raise ValueError(f"No reference fit per '{by}' available")
+    codes = fit['levels'].get_indexer(df[by].values[rows])
+    slopes = np.column_stack([fit['slope'], np.full(len(fit['slope']), np.nan)])
+    intercepts = np.column_stack([fit['intercept'], np.full(len(fit['intercept']), np.nan)])
+    return slopes[:, codes], intercepts[:, codes]
+
+
+@instrumented('pce_vs_reference')
+def pce_vs_reference(session, groups, xaxis, path, by=None):
+    # groups=None compares every group in the frame
+    df = session.df
+    rows = np.arange(len(df.index)) if groups is None else \
+        np.concatenate([group_rows(session, group) for group in groups] + [np.empty(0, dtype=int)])
+    keys = ['isc_eff', 'pmax_eff']
+    slopes, intercepts = reference_lines(session, df, rows, by)
+    impr = np.column_stack([column_or_nan(df, f"{key[:-3]}impr") for key in keys]).T
+    dimpr = np.column_stack([column_or_nan(df, f"d{key[:-3]}impr") for key in keys]).T
+    impr[:, rows] = df[keys].values[rows].T - (slopes * df[xaxis].values[rows] + intercepts)
+    dimpr[:, rows] = df[[f"d{key}" for key in keys]].values[rows].T
+    for i, key in enumerate(keys):
+        df[f"{key[:-3]}impr"] = impr[i]
+        df[f"d{key[:-3]}impr"] = dimpr[i]
+    write_frame(df, path)
+    return session
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def linear_fit(x, y, weights=None):
+    # weighted least squares y = slope * x + intercept along the last axis, for any number of leading fit axes;
+    # x and weights broadcast against y and NaN points are left out of their own fit
+    y = np.asarray(y, dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    w = np.ones(y.shape) if weights is None else np.broadcast_to(np.asarray(weights, dtype=float), y.shape)
+    mask = ~(np.isnan(x) | np.isnan(y) | np.isnan(w))
+    w = np.where(mask, w, 0.)
+    x0, y0 = np.where(mask, x, 0.), np.where(mask, y, 0.)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sw = w.sum(axis=-1)
+        x_mean = (w * x0).sum(axis=-1) / sw
+        y_mean = (w * y0).sum(axis=-1) / sw
+        dx = np.where(mask, x0 - x_mean[..., None], 0.)
+        sxx = (w * dx ** 2).sum(axis=-1)
+        slope = (w * dx * (y0 - y_mean[..., None])).sum(axis=-1) / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = np.where(mask, y0 - (slope[..., None] * x0 + intercept[..., None]), 0.)
+        variance = (w * residuals ** 2).sum(axis=-1) / (mask.sum(axis=-1) - 2)
+        dslope = np.sqrt(variance / sxx)
+        dintercept = np.sqrt(variance * (1 / sw + x_mean ** 2 / sxx))
+    return {'slope': slope, 'intercept': intercept, 'dslope': dslope, 'dintercept': dintercept,
+            'y_pred': slope[..., None] * x + intercept[..., None]}
+
+
+def grouped_linear_fit(x, y, codes, n_groups, weights=None):
+    # a separate weighted line per group code for every row of y (n_targets, n_points), all in one bincount pass;
+    # points with code -1 or NaN are left out, fit results have shape (n_targets, n_groups)
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    w = np.ones(y.shape) if weights is None else np.broadcast_to(np.asarray(weights, dtype=float), y.shape)
+    codes = np.broadcast_to(np.asarray(codes), y.shape)
+    mask = ~(np.isnan(x) | np.isnan(y) | np.isnan(w)) & (codes >= 0)
+    w, x0, y0 = np.where(mask, w, 0.), np.where(mask, x, 0.), np.where(mask, y, 0.)
+    targets = np.broadcast_to(np.arange(len(y))[:, None], y.shape)
+    keys = (targets * n_groups + np.where(mask, codes, 0)).ravel()
+
+    def total(values):
+        return np.bincount(keys, values.ravel(), minlength=len(y) * n_groups).reshape(len(y), n_groups)
+
+    def at_points(values):
+        return values[targets, np.where(mask, codes, 0)]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sw = total(w)
+        x_mean, y_mean = total(w * x0) / sw, total(w * y0) / sw
+        dx = np.where(mask, x0 - at_points(x_mean), 0.)
+        sxx = total(w * dx ** 2)
+        slope = total(w * dx * (y0 - at_points(y_mean))) / sxx
+        intercept = y_mean - slope * x_mean
+        residuals = np.where(mask, y0 - (at_points(slope) * x0 + at_points(intercept)), 0.)
+        variance = total(w * residuals ** 2) / (total(mask.astype(float)) - 2)
+        dslope = np.sqrt(variance / sxx)
+        dintercept = np.sqrt(variance * (1 / sw + x_mean ** 2 / sxx))
+        y_pred = np.where(codes >= 0, at_points(slope) * x + at_points(intercept), np.nan)
+    return {'slope': slope, 'intercept': intercept, 'dslope': dslope, 'dintercept': dintercept, 'y_pred': y_pred}
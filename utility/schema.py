@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+# Measurements keep far more digits in float32 than the instruments resolve; timestamps stay float64 since epoch
+# seconds need its precision. Repeated labels become categoricals.
+float32_columns = ['isc_fit', 'voc_fit', 'pmax_fit', 't_sample', 'irrad1', 'irrad2', 'irrad3', 'irrad4', 't_room',
+                   'rh_room']
+category_columns = ['name', 'film_id', 'Matrix', 'Solvent', 'QD Type', 'QD Batch', 'QD Manufacturer', 'Additives']
+
+
+def compact_frame(df):
+    df = df.astype({col: np.float32 for col in float32_columns if col in df.columns and df[col].dtype.kind == 'f'})
+    for col in category_columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col]
+            if pd.api.types.infer_dtype(values, skipna=True).startswith('mixed'):
+                values = values.where(values.isna(), values.astype(str))  # e.g. numeric and text batch names
+            df[col] = values.astype('category')
+    return df
+
+
+def fill_labels(values, fill='None'):
+    # fillna that also works on categorical columns
+    if isinstance(values.dtype, pd.CategoricalDtype) and fill not in values.cat.categories:
+        values = values.cat.add_categories(fill)
+    return values.fillna(fill)
+
+
+def memory_report(df_before, df_after):
+    before = df_before.memory_usage(index=True, deep=True)
+    after = df_after.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({'dtype before': df_before.dtypes.astype(str), 'dtype after': df_after.dtypes.astype(str),
+                           'bytes before': before, 'bytes after': after})
+    report = report.fillna({'dtype before': '', 'dtype after': ''})
+    report.loc['Total'] = ['', '', before.sum(), after.sum()]
+    report['saved (%)'] = (100 * (1 - report['bytes after'] / report['bytes before'])).round(1)
+    return report
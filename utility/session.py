@@ -0,0 +1,60 @@
+import pandas as pd
+
+from utility.config import defaults, paths
+
+
+class Session:
+
+    def __init__(self, df=None, export_path=None, film_db=None, profile=False, timezone=None):
+        self._df = pd.DataFrame() if df is None else df
+        self._cache = dict()
+        self.irrad_fit_pars = [[0, 0], [0, 0], [0, 0]]
+        self.reference_fit_pars = [[0, 0], [0, 0]]
+        self.grouped_reference_fit = None
+        self.efficiency_reference = None
+        self.report = list()
+        self.memory_report = None
+        self.profile = profile
+        self._export_path = export_path
+        self._film_db = film_db
+        self._timezone = timezone
+
+    # derived tables are cached per data frame, assigning a new frame drops them
+    @property
+    def df(self):
+        return self._df
+
+    @df.setter
+    def df(self, df):
+        self._df = df
+        self._cache = dict()
+
+    def cached(self, name, compute):
+        if name not in self._cache:
+            self._cache[name] = compute(self._df)
+        return self._cache[name]
+
+    # fall back to the folders picked in the GUI unless the session was given its own
+    @property
+    def export_path(self):
+        return self._export_path or paths['last_export']
+
+    @export_path.setter
+    def export_path(self, path):
+        self._export_path = path
+
+    @property
+    def film_db(self):
+        return self._film_db or paths['film_db']
+
+    @film_db.setter
+    def film_db(self, path):
+        self._film_db = path
+
+    @property
+    def timezone(self):
+        return self._timezone or defaults['timezone']
+
+    @timezone.setter
+    def timezone(self, tz):
+        self._timezone = tz
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+
+from utility.checkpoint import backend_for, find_stage, load_stage, remove_stage, save_stage, stage_exists, \
+    stage_path
+from utility.config import defaults
+
+
+def canonical_column(column):
+    # the form a column takes after any checkpoint round trip: compact_frame's narrow numbers and categories are
+    # widened, datetimes are in nanoseconds
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return column.astype(dtype.categories.dtype)
+    if dtype.kind == 'M':
+        return column.dt.as_unit('ns')
+    if dtype.kind in 'iuf' and dtype.itemsize < 8:
+        return column.astype(np.float64 if dtype.kind == 'f' else np.int64)
+    return column
+
+
+def frame_digest(df):
+    # hashed in canonical form, so a freshly computed frame and its saved checkpoint give the same key
+    columns = df.columns
+    df = pd.DataFrame({i: canonical_column(df.iloc[:, i]) for i in range(df.shape[1])}, index=df.index)
+    digest = hashlib.sha1()
+    digest.update(repr([(str(col), str(dtype)) for col, dtype in zip(columns, df.dtypes)]).encode())
+    digest.update(repr(list(df.index.names)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def stage_key(stage, df, params):
+    digest = hashlib.sha1()
+    digest.update(stage.encode())
+    digest.update(frame_digest(df).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def link_file(source, target):
+    # hard link where the file system allows it, a copy elsewhere
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+    return target
+
+
+class StageCache:
+    # entries are hard links to the stage checkpoints written by run_stage, so a stage's output is serialized once
+
+    def __init__(self, folder, max_entries=32):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.index_path = os.path.join(folder, 'index.json')
+        self.index = dict()
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def write_index(self):
+        with open(self.index_path, 'w') as f:
+            json.dump(self.index, f, indent=1)
+
+    def get(self, key):
+        # path of the cached checkpoint file
+        entry = self.index.get(key)
+        if entry is None or not os.path.exists(entry['path']):
+            return None
+        entry['used'] = time.time()
+        self.write_index()
+        return entry['path']
+
+    def put(self, key, stage, checkpoint):
+        os.makedirs(self.folder, exist_ok=True)
+        path = link_file(checkpoint, os.path.join(self.folder, key + os.path.splitext(checkpoint)[1]))
+        self.index[key] = {'stage': stage, 'path': path, 'used': time.time()}
+        self.evict()
+        self.write_index()
+
+    def evict(self):
+        while len(self.index) > self.max_entries:
+            key = min(self.index, key=lambda k: self.index[k]['used'])
+            if os.path.exists(self.index[key]['path']):
+                os.remove(self.index[key]['path'])
+            del self.index[key]
+
+
+def run_stage(session, stage, compute, params, overwrite=False):
+    folder = session.export_path
+    if session.df.empty and not overwrite and stage_exists(stage, folder):
+        # nothing to hash in a fresh session: resume from the stage's saved output
+        session.df = load_stage(stage, folder)
+        return session
+    cache = StageCache(os.path.join(folder, 'stage_cache'), defaults['stage_cache'])
+    key = stage_key(stage, session.df, params)
+    cached = None if overwrite else cache.get(key)
+    if cached is None:
+        session.df = compute(session.df)
+        cache.put(key, stage, save_stage(session.df, stage, folder))
+        return session
+    checkpoint = find_stage(stage, folder)
+    if checkpoint is None or not os.path.samefile(checkpoint, cached):
+        # the checkpoint holds another run's output: put the cached one back in its place
+        remove_stage(stage, folder)
+        link_file(cached, stage_path(stage, folder, backend_for(cached)))
+    session.df = load_stage(stage, folder)
+    return session
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from utility.trace_processing import block_labels
+
+
+class SummaryTable:
+    # array backed IV summary: rows go into preallocated buffers that double when full, one DataFrame at the end
+
+    def __init__(self, labels=None, capacity=64):
+        self.labels = list(block_labels if labels is None else labels)
+        self.n_rows = 0
+        self.values = np.full((capacity, len(self.labels)), np.nan)
+        self.names = np.empty(capacity, dtype=object)
+        self.traces = np.empty(capacity, dtype=object)
+        self.times = np.full(capacity, np.nan)
+
+    def __len__(self):
+        return self.n_rows
+
+    def reserve(self, n_rows):
+        if n_rows <= len(self.times):
+            return
+        capacity = max(n_rows, 2 * len(self.times))
+        values = np.full((capacity, len(self.labels)), np.nan)
+        values[:self.n_rows] = self.values[:self.n_rows]
+        self.values = values
+        self.names = np.concatenate([self.names, np.empty(capacity - len(self.names), dtype=object)])
+        self.traces = np.concatenate([self.traces, np.empty(capacity - len(self.traces), dtype=object)])
+        self.times = np.concatenate([self.times, np.full(capacity - len(self.times), np.nan)])
+
+    def append_block(self, name, trace_names, times, block):
+        n = len(trace_names)
+        self.reserve(self.n_rows + n)
+        rows = slice(self.n_rows, self.n_rows + n)
+        self.values[rows] = block
+        self.names[rows] = name
+        self.traces[rows] = trace_names
+        self.times[rows] = times
+        self.n_rows += n
+
+    def column(self, label):
+        return self.values[:self.n_rows, self.labels.index(label)]
+
+    def to_dataframe(self, time_converter=None):
+        # the converter gets the whole time column at once, e.g. utility.conversions.epoch_to_datetime
+        times = self.times[:self.n_rows]
+        data = pd.DataFrame(self.values[:self.n_rows], columns=self.labels)
+        data.insert(0, 'Name', self.names[:self.n_rows])
+        data.insert(1, 'Trace', self.traces[:self.n_rows])
+        data.insert(2, 'Time', times if time_converter is None else time_converter(times))
+        return data
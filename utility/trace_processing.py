@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+from utility.data_import import Experiment
+from utility.fitting import fit_labels, fit_traces
+
+import_labels = {'Open Circuit Voltage V_oc (V)': ['Voc', 'dVoc'],
+                 'Short Circuit Current I_sc (A)': ['Isc', 'dIsc'],
+                 'Maximum Power P_max (W)': ['Pmax', 'dPmax'],
+                 'Fill Factor': ['FF', 'dFF'],
+                 'Average Temperature T_avg (C)': ['Tsample', 'dTsample'],
+                 'Average Irradiance I_1_avg (W/m2)': ['Irrad1', 'dIrrad1'],
+                 'Average Irradiance I_2_avg (W/m2)': ['Irrad2', 'dIrrad2'],
+                 'Average Irradiance I_3_avg (W/m2)': ['Irrad3', 'dIrrad3'],
+                 'Average Irradiance I_4_avg (W/m2)': ['Irrad4', 'dIrrad4']}
+
+value_labels = [label for labels in import_labels.values() for label in labels]
+block_labels = value_labels + fit_labels
+averaged_labels = [label for label in fit_labels if not label.startswith('d')]
+
+
+def value_row(values):
+    return [value for key in import_labels for value in values[key]]
+
+
+def fit_experiment(folder):
+    # one float block per experiment: a row per trace plus a trailing 'Average' row, columns as in block_labels
+    experiment = Experiment(folder_path=folder)
+    traces = list(experiment.traces.values())
+    fits = fit_traces(traces)
+    values = np.array([value_row(trace.values) for trace in traces] + [value_row(experiment.values)], dtype=float)
+    block = np.full((len(traces) + 1, len(block_labels)), np.nan)
+    block[:, :len(value_labels)] = values.reshape(len(traces) + 1, -1)
+    for label in fit_labels:
+        block[:-1, block_labels.index(label)] = fits[label]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        for label in averaged_labels:
+            column = block[:-1, block_labels.index(label)]
+            block[-1, block_labels.index(label)] = np.nanmean(column)
+            if f'd{label}' in block_labels:
+                block[-1, block_labels.index(f'd{label}')] = np.nanstd(column, ddof=1)
+    times = np.array([trace.values['Time (s)'][0] for trace in traces] + [experiment.values['Time (s)'][0]],
+                     dtype=float)
+    return [trace.name for trace in traces] + ['Average'], times, block
+
+
+def fit_chunk(folders):
+    return [fit_experiment(folder) for folder in folders]
+
+
+def fit_experiments(folders, workers=None, chunksize=1, progress=None):
+    chunks = [folders[i:i + chunksize] for i in range(0, len(folders), chunksize)]
+    results = [None] * len(chunks)
+    done = 0
+    if workers == 1:
+        for i, chunk in enumerate(chunks):
+            results[i] = fit_chunk(chunk)
+            done += len(chunk)
+            if progress:
+                progress(done, len(folders))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fit_chunk, chunk): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                done += len(chunks[futures[future]])
+                if progress:
+                    progress(done, len(folders))
+    return [result for chunk in results for result in chunk]